@@ -0,0 +1,21 @@
+# encoding: utf-8
+"""
+加载 预标注桌面工具.py 供基准测试脚本使用（文件名不是常规模块名）
+"""
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOL_PATH = os.path.join(ROOT, "预标注桌面工具.py")
+
+
+def load_tool():
+    """导入工具模块（不启动界面）"""
+    if "annotation_tool" in sys.modules:
+        return sys.modules["annotation_tool"]
+    spec = importlib.util.spec_from_file_location("annotation_tool", TOOL_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["annotation_tool"] = module
+    spec.loader.exec_module(module)
+    return module
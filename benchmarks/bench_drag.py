@@ -0,0 +1,87 @@
+# encoding: utf-8
+"""
+标注框拖动基准：每次移动都 gettags + eval 解析标签字符串的旧流程 对比 CanvasItemMap 字典查找
+
+用法:
+    python benchmarks/bench_drag.py [--events 2000]
+在1k/10k框的合成场景上输出两种方式每个拖动事件的耗时（微秒）。需要图形界面环境。
+"""
+import argparse
+import random
+import time
+import tkinter as tk
+from types import SimpleNamespace
+
+from _tool import load_tool
+
+
+def make_annotations(count, seed=0):
+    rng = random.Random(seed)
+    annotations = []
+    for index in range(count):
+        x1, y1 = rng.randint(0, 3800), rng.randint(0, 2000)
+        annotations.append({"label": f"class_{rng.randint(0, 9)}",
+                            "bbox": [x1, y1, x1 + rng.randint(5, 200), y1 + rng.randint(5, 200)],
+                            "id": index})
+    return annotations
+
+
+def legacy_drag(annotator, event):
+    """改动前 on_canvas_drag 移动分支的做法"""
+    canvas = annotator.canvas
+    cur_x = canvas.canvasx(event.x)
+    cur_y = canvas.canvasy(event.y)
+    new_x1 = cur_x - annotator.drag_offset_x
+    new_y1 = cur_y - annotator.drag_offset_y
+    bbox_coords = canvas.coords(annotator.selected_bbox_id)
+    new_x2 = new_x1 + bbox_coords[2] - bbox_coords[0]
+    new_y2 = new_y1 + bbox_coords[3] - bbox_coords[1]
+    canvas.coords(annotator.selected_bbox_id, new_x1, new_y1, new_x2, new_y2)
+    tags = canvas.gettags(annotator.selected_bbox_id)
+    if len(tags) > 2:
+        text_id = int(eval(tags[2])[1])
+        canvas.coords(text_id, new_x1, new_y1 - annotator.label_text_gap)
+
+
+def measure(drag, events):
+    start = time.perf_counter()
+    for event in events:
+        drag(event)
+    return (time.perf_counter() - start) * 1e6 / len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=2000, help="每种场景的拖动事件数")
+    args = parser.parse_args()
+
+    tool = load_tool()
+    root = tk.Tk()
+    root.withdraw()
+    annotator = tool.ImageAnnotator(root, None)
+    annotator.image_size = (4000, 2200)
+
+    print(f"{'框数量':>6} {'旧流程 微秒/事件':>16} {'新流程 微秒/事件':>16} {'加速':>8}")
+    for count in (1000, 10000):
+        annotator.annotations = tool.AnnotationSet.from_records(make_annotations(count))
+        annotator.redraw_annotations()
+        for annotation in annotator.annotations:
+            # 旧流程依赖的第三个标签：矩形框和文字id的字符串
+            rect_id, text_id = annotator.canvas_items.items_of(annotation)
+            annotator.canvas.itemconfig(rect_id, tags=("bbox", str(annotation["id"]), str([rect_id, text_id])))
+        annotation = annotator.annotations[count // 2]
+        annotator.current_annotation = annotation
+        annotator.selected_bbox_id = annotator.canvas_items.items_of(annotation)[0]
+        annotator.mode = "move"
+        annotator.dragging = True
+        annotator.drag_offset_x = annotator.drag_offset_y = 5
+        rng = random.Random(count)
+        events = [SimpleNamespace(x=rng.randint(0, 1000), y=rng.randint(0, 800)) for _ in range(args.events)]
+        legacy_us = measure(lambda event: legacy_drag(annotator, event), events)
+        fast_us = measure(annotator.on_canvas_drag, events)
+        print(f"{count:>6} {legacy_us:>16.1f} {fast_us:>16.1f} {legacy_us / fast_us:>7.2f}x")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# encoding: utf-8
+"""
+标注选中高亮基准：逐个重置全部标注颜色的旧流程 对比 只更新上次高亮和本次选中的新流程
+
+用法:
+    python benchmarks/bench_highlight.py [--selections 200]
+在1k/10k框的合成场景上输出两种方式每次选中的耗时（毫秒）和画布Tk调用次数。需要图形界面环境。
+"""
+import argparse
+import random
+import time
+import tkinter as tk
+
+from _tool import load_tool
+
+
+class CountingTk(object):
+    """统计画布发出的Tcl调用次数"""
+
+    def __init__(self, tk_app):
+        self.tk_app = tk_app
+        self.calls = 0
+
+    def call(self, *args):
+        self.calls += 1
+        return self.tk_app.call(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.tk_app, name)
+
+
+def make_annotations(count, seed=0):
+    rng = random.Random(seed)
+    annotations = []
+    for index in range(count):
+        x1, y1 = rng.randint(0, 3800), rng.randint(0, 2000)
+        annotations.append({"label": f"class_{rng.randint(0, 9)}",
+                            "bbox": [x1, y1, x1 + rng.randint(5, 200), y1 + rng.randint(5, 200)],
+                            "id": index})
+    return annotations
+
+
+def legacy_highlight(annotator, index):
+    """改动前 highlight_annotation 的画布更新方式"""
+    canvas = annotator.canvas
+    for ann in annotator.annotations:
+        if "canvas_ids" in ann:
+            for canvas_id in ann["canvas_ids"]:
+                if canvas.type(canvas_id) == "rectangle":
+                    canvas.itemconfig(canvas_id, outline="red", width=2)
+                elif canvas.type(canvas_id) == "text":
+                    canvas.itemconfig(canvas_id, fill="red")
+    annotation = annotator.annotations[index]
+    for canvas_id in annotation["canvas_ids"]:
+        if canvas.type(canvas_id) == "rectangle":
+            canvas.itemconfig(canvas_id, outline="blue", width=2)
+        elif canvas.type(canvas_id) == "text":
+            canvas.itemconfig(canvas_id, fill="blue")
+
+
+def measure(annotator, counter, select, indices):
+    counter.calls = 0
+    start = time.perf_counter()
+    for index in indices:
+        select(index)
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000 / len(indices), counter.calls / len(indices)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--selections", type=int, default=200, help="每种场景的选中次数")
+    args = parser.parse_args()
+
+    tool = load_tool()
+    root = tk.Tk()
+    root.withdraw()
+    annotator = tool.ImageAnnotator(root, None)
+    counter = CountingTk(annotator.canvas.tk)
+    annotator.canvas.tk = counter
+    annotator.image_size = (4000, 2200)
+
+    print(f"{'框数量':>6} {'旧流程 毫秒/次':>14} {'旧流程 Tk调用/次':>16} {'新流程 毫秒/次':>14} {'新流程 Tk调用/次':>16}")
+    for count in (1000, 10000):
+        annotator.annotations = tool.AnnotationSet.from_records(make_annotations(count))
+        annotator.redraw_annotations()
+        rng = random.Random(count)
+        indices = [rng.randrange(count) for _ in range(args.selections)]
+        legacy_ms, legacy_calls = measure(annotator, counter, lambda i: legacy_highlight(annotator, i), indices)
+        annotator.redraw_annotations()
+        fast_ms, fast_calls = measure(annotator, counter, annotator.highlight_annotation, indices)
+        print(f"{count:>6} {legacy_ms:>14.2f} {legacy_calls:>16.0f} {fast_ms:>14.2f} {fast_calls:>16.0f}")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# encoding: utf-8
+"""
+平铺文件夹扫描基准：整层排序后再产出的旧流程 对比 按scandir顺序逐批产出（批内排序）+ 结束后整体排序一次
+
+用法:
+    python benchmarks/bench_scan.py [--files 100000] [--folder 已有的平铺文件夹]
+在临时文件夹中生成空图片文件（或使用指定文件夹），输出两种方式产出第一批的耗时和全部扫描完的耗时（毫秒），
+并校验整体排序后的结果与旧流程一致。
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from _tool import load_tool
+
+
+def legacy_scan(tool, root, batch_size=256):
+    """改动前 scan_images 的做法：每层先列完整层并按文件名排序，再逐批产出"""
+    with os.scandir(root) as iterator:
+        entries = sorted(iterator, key=lambda entry: entry.name)
+    batch = []
+    for entry in entries:
+        if entry.is_file() and entry.name.lower().endswith(tool.IMAGE_EXTENSIONS):
+            batch.append(entry.path)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def measure(batches):
+    start = time.perf_counter()
+    first = None
+    paths = []
+    for batch in batches:
+        if first is None:
+            first = time.perf_counter() - start
+        paths.extend(batch)
+    return (first or 0.0) * 1000, paths, start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=100000, help="生成的图片文件数量")
+    parser.add_argument("--folder", default=None, help="使用已有的平铺文件夹（不生成文件）")
+    args = parser.parse_args()
+
+    tool = load_tool()
+    folder = args.folder or tempfile.mkdtemp(prefix="bench_scan_")
+    try:
+        if args.folder is None:
+            for index in range(args.files):
+                open(os.path.join(folder, f"img_{(index * 7919) % args.files:07d}.jpg"), "wb").close()
+
+        legacy_first, legacy_paths, start = measure(legacy_scan(tool, folder))
+        legacy_total = (time.perf_counter() - start) * 1000
+        fast_first, fast_paths, start = measure(tool.scan_images(folder, recursive=False))
+        fast_paths.sort(key=lambda path: tool.scan_sort_key(folder, path))
+        fast_total = (time.perf_counter() - start) * 1000
+
+        assert fast_paths == legacy_paths, "整体排序后的结果与旧流程不一致"
+        print(f"{'文件数':>8} {'旧流程 首批毫秒':>14} {'旧流程 总毫秒':>12} {'新流程 首批毫秒':>14} {'新流程 总毫秒(含排序)':>20}")
+        print(f"{len(fast_paths):>8} {legacy_first:>14.1f} {legacy_total:>12.1f} {fast_first:>14.1f} {fast_total:>20.1f}")
+    finally:
+        if args.folder is None:
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# encoding: utf-8
+"""
+多进程推理扩展性基准：用 predict 命令行依次以1..N个推理进程处理同一批素材，输出吞吐和加速比
+
+用法:
+    python benchmarks/bench_shards.py --model best.pt --source 素材文件夹 [--processes 1 2 4 8] [--format TXT]
+默认进程数为 1、2、4…直到物理核心数。每次都加 --no-resume 重新处理全部素材，
+会覆盖素材旁的标注文件，请使用素材的副本。
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from _tool import TOOL_PATH, load_tool
+
+
+def run_predict(args, processes):
+    """运行一次predict命令，返回其输出的JSON统计"""
+    command = [sys.executable, TOOL_PATH, "predict", "--model", args.model, "--source", args.source,
+               "--format", args.format, "--batch", str(args.batch), "--processes", str(processes), "--no-resume"]
+    result = subprocess.run(command, capture_output=True, text=True, encoding="utf-8")
+    lines = result.stdout.strip().splitlines()
+    if not lines:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "predict没有输出")
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", required=True, help="YOLO模型文件")
+    parser.add_argument("--source", required=True, help="素材文件夹（会写入标注文件，请使用副本）")
+    parser.add_argument("--processes", type=int, nargs="+", default=None, help="要测试的推理进程数")
+    parser.add_argument("--format", choices=("VOC", "TXT"), default="TXT", help="标注保存格式")
+    parser.add_argument("--batch", type=int, default=16, help="每次送入模型的图片数量")
+    args = parser.parse_args()
+
+    physical = load_tool().physical_cpu_count()
+    counts = args.processes
+    if counts is None:
+        counts, count = [], 1
+        while count < physical:
+            counts.append(count)
+            count *= 2
+        counts.append(physical)
+    print(f"物理核心数: {physical}")
+    print(f"{'进程数':>6} {'张/秒':>10} {'加速比':>8} {'并行效率':>8} {'p95延迟秒':>10}")
+    baseline = None
+    for processes in counts:
+        stats = run_predict(args, processes)
+        rate = stats["images_per_second"]
+        baseline = baseline or rate
+        speedup = rate / baseline if baseline else 0.0
+        print(f"{processes:>6} {rate:>10.2f} {speedup:>7.2f}x {speedup / processes:>8.0%} "
+              f"{stats['latency_p95'] or 0:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# encoding: utf-8
+"""
+冷启动导入基准：用 python -X importtime 导入工具模块（不启动界面），输出耗时最多的导入
+
+用法:
+    python benchmarks/bench_startup.py [--repeat 5] [--top 15] [--budget-ms 0]
+同时检查启动时没有导入 ultralytics/torch/cv2/numpy 这类重依赖；
+--budget-ms 大于0时，导入工具模块的累计耗时超过预算则以非0状态退出，可用于防止回退。
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+# 启动时不应导入的重依赖（首次推理/解码时才导入）
+HEAVY_MODULES = ("ultralytics", "torch", "cv2", "numpy")
+# 工具模块通过文件路径加载，不出现在importtime输出中，单独计时后打印到stdout
+IMPORT_SCRIPT = (f"import sys, time; sys.path.insert(0, {BENCH_DIR!r}); from _tool import load_tool; "
+                 f"start = time.perf_counter(); load_tool(); print(int((time.perf_counter() - start) * 1e6))")
+
+
+def run_importtime():
+    """
+    在子进程中导入工具模块
+    返回:
+        (工具模块导入耗时us, [(模块名, 自身耗时us, 累计耗时us, 缩进层级)])
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_SCRIPT],
+                            capture_output=True, text=True, encoding="utf-8")
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return int(result.stdout.strip().splitlines()[-1]), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取工具模块导入耗时最小的一次")
+    parser.add_argument("--top", type=int, default=15, help="列出累计耗时最多的前N个导入")
+    parser.add_argument("--budget-ms", type=float, default=0, help="工具模块导入耗时预算（毫秒），0表示不检查")
+    args = parser.parse_args()
+
+    best_rows, best_total = None, None
+    for _ in range(args.repeat):
+        total, rows = run_importtime()
+        if best_total is None or total < best_total:
+            best_rows, best_total = rows, total
+
+    print(f"工具模块导入累计耗时: {best_total / 1000:.1f} ms（{args.repeat}次取最小）")
+    print(f"{'累计ms':>9} {'自身ms':>9}  模块")
+    for name, self_us, cumulative_us, depth in sorted(best_rows, key=lambda row: -row[2])[:args.top]:
+        print(f"{cumulative_us / 1000:>9.1f} {self_us / 1000:>9.1f}  {'  ' * depth}{name}")
+
+    failed = False
+    imported = {name.split(".")[0] for name, _, _, _ in best_rows}
+    heavy = [name for name in HEAVY_MODULES if name in imported]
+    if heavy:
+        print(f"启动时导入了重依赖: {', '.join(heavy)}")
+        failed = True
+    if args.budget_ms and best_total / 1000 > args.budget_ms:
+        print(f"超出预算 {args.budget_ms:.1f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# encoding: utf-8
+"""
+VOC标注写入基准：ET + minidom.toprettyxml 旧流程 对比 render_voc_xml 直接生成
+
+用法:
+    python benchmarks/bench_voc_writer.py [--seconds 1.0]
+输出每种框数量（1/50/500）下两种方式的 文件/秒，并校验两者输出逐字节一致。
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from xml.dom import minidom
+
+from _tool import load_tool
+
+
+def make_boxes(count, seed=0):
+    rng = random.Random(seed)
+    boxes = []
+    for _ in range(count):
+        x1, y1 = rng.randint(0, 5000), rng.randint(0, 3000)
+        boxes.append((x1, y1, x1 + rng.randint(5, 900), y1 + rng.randint(5, 900), rng.random(), rng.randint(0, 9)))
+    return boxes
+
+
+def legacy_xml(img_path, boxes, names):
+    """改动前 save_boxes_to_xml 的生成方式"""
+    annotation = ET.Element('annotation')
+    ET.SubElement(annotation, 'folder').text = os.path.dirname(img_path) or 'images'
+    ET.SubElement(annotation, 'filename').text = os.path.basename(img_path)
+    ET.SubElement(annotation, 'path').text = img_path
+    source = ET.SubElement(annotation, 'source')
+    ET.SubElement(source, 'database').text = 'Unknown'
+    size = ET.SubElement(annotation, 'size')
+    ET.SubElement(size, 'width').text = '6000'
+    ET.SubElement(size, 'height').text = '4000'
+    ET.SubElement(size, 'depth').text = '3'
+    ET.SubElement(annotation, 'segmented').text = '0'
+    for x1, y1, x2, y2, conf, class_id in boxes:
+        obj = ET.SubElement(annotation, 'object')
+        ET.SubElement(obj, 'name').text = names[class_id]
+        ET.SubElement(obj, 'pose').text = 'Unspecified'
+        ET.SubElement(obj, 'truncated').text = '0'
+        ET.SubElement(obj, 'difficult').text = '0'
+        ET.SubElement(obj, 'confidence').text = f'{conf:.4f}'
+        bndbox = ET.SubElement(obj, 'bndbox')
+        ET.SubElement(bndbox, 'xmin').text = str(x1)
+        ET.SubElement(bndbox, 'ymin').text = str(y1)
+        ET.SubElement(bndbox, 'xmax').text = str(x2)
+        ET.SubElement(bndbox, 'ymax').text = str(y2)
+    rough_string = ET.tostring(annotation, 'utf-8')
+    return minidom.parseString(rough_string).toprettyxml(indent="  ", encoding="utf-8").decode('utf-8')
+
+
+def fast_xml(tool, img_path, boxes, names):
+    children = [
+        ("folder", os.path.dirname(img_path) or 'images'),
+        ("filename", os.path.basename(img_path)),
+        ("path", img_path),
+        ("source", [("database", 'Unknown')]),
+        ("size", [("width", '6000'), ("height", '4000'), ("depth", '3')]),
+        ("segmented", '0'),
+    ]
+    for x1, y1, x2, y2, conf, class_id in boxes:
+        children.append(('object', [
+            ('name', names[class_id]),
+            ('pose', 'Unspecified'),
+            ('truncated', '0'),
+            ('difficult', '0'),
+            ('confidence', f'{conf:.4f}'),
+            ('bndbox', [('xmin', str(x1)), ('ymin', str(y1)), ('xmax', str(x2)), ('ymax', str(y2))]),
+        ]))
+    return tool.render_voc_xml('annotation', children, encoding='utf-8')
+
+
+def files_per_second(write_one, seconds):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        write_one()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=1.0, help="每项测试的持续时间")
+    args = parser.parse_args()
+
+    tool = load_tool()
+    names = [f"class_{i}" for i in range(10)]
+    img_path = "D:/素材/camera01/IMG_0001.jpg"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xml_path = os.path.join(tmp_dir, "IMG_0001.xml")
+        print(f"{'框数量':>6} {'旧流程 文件/秒':>16} {'新流程 文件/秒':>16} {'加速':>8}")
+        for count in (1, 50, 500):
+            boxes = make_boxes(count)
+            assert legacy_xml(img_path, boxes, names) == fast_xml(tool, img_path, boxes, names), "输出不一致"
+
+            def write_legacy():
+                tool.atomic_write_text(xml_path, legacy_xml(img_path, boxes, names))
+
+            def write_fast():
+                tool.atomic_write_text(xml_path, fast_xml(tool, img_path, boxes, names))
+
+            legacy_rate = files_per_second(write_legacy, args.seconds)
+            fast_rate = files_per_second(write_fast, args.seconds)
+            print(f"{count:>6} {legacy_rate:>16.1f} {fast_rate:>16.1f} {fast_rate / legacy_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
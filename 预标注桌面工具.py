@@ -6,17 +6,1392 @@
 @file: 预标注桌面工具.py
 annotation desktop tools
 """
+import argparse
+import fnmatch
+import hashlib
+import importlib
+import io
 import json
+import multiprocessing
 import os
+import queue
+import re
+import sys
+import threading
+import time
 import tkinter as tk
+import tkinter.font as tkfont
 import xml.etree.ElementTree as ET
+from collections import OrderedDict, deque
 from tkinter import filedialog, messagebox, ttk
-from xml.dom import minidom
 
-import cv2
-import numpy as np
 from PIL import Image, ImageTk
-from ultralytics import YOLO
+
+
+class _LazyModule(object):
+    """
+    首次访问属性时才导入的模块代理：cv2/numpy 不在启动时导入，
+    只手工标注时窗口不必等待这些依赖加载
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+cv2 = _LazyModule("cv2")
+np = _LazyModule("numpy")
+
+
+def warm_up_imports(module_names):
+    """
+    在后台线程中预先导入依赖（主窗口显示之后调用），首次推理/解码时不再等待导入
+    """
+    def run():
+        for name in module_names:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass  # 缺少依赖时推迟到真正使用时再报错
+
+    thread = threading.Thread(target=run, name="import-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+# 已加载的YOLO模型缓存，键为 (模型绝对路径, 文件修改时间)
+_MODEL_CACHE = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
+
+def load_yolo_model(model_path):
+    """
+    加载YOLO模型（带缓存），同一权重文件在整个运行期间只加载一次
+
+    参数:
+        model_path: YOLO模型路径
+    返回:
+        YOLO模型对象；权重文件被替换（修改时间变化）后会重新加载
+    """
+    model_path = os.path.abspath(model_path)
+    key = (model_path, os.path.getmtime(model_path))
+    with _MODEL_CACHE_LOCK:
+        model = _MODEL_CACHE.get(key)
+        if model is None:
+            # 同一路径的旧权重已失效，释放后再加载新权重
+            for stale_key in [k for k in _MODEL_CACHE if k[0] == model_path]:
+                del _MODEL_CACHE[stale_key]
+            from ultralytics import YOLO  # 导入ultralytics会同时加载torch，推迟到首次加载模型时
+            model = YOLO(model_path)
+            _MODEL_CACHE[key] = model
+    return model
+
+
+def atomic_write_text(file_path, text, encoding="utf-8"):
+    """
+    先写临时文件再替换，保证中途退出时不会留下写了一半的标注文件
+    """
+    atomic_write_bytes(file_path, text.encode(encoding))
+
+
+def atomic_write_bytes(file_path, data):
+    """
+    原子写入二进制内容（一次write系统调用）
+    """
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, file_path)
+
+
+def write_yolo_labels(txt_path, class_ids, boxes_xywhn):
+    """
+    向量化写入YOLO格式标注：所有行一次格式化、一次写盘
+
+    参数:
+        txt_path: TXT文件保存路径
+        class_ids: (N,) 类别id数组
+        boxes_xywhn: (N,4) 归一化的 x_center, y_center, width, height
+    """
+    rows = np.column_stack((np.asarray(class_ids, dtype=np.float64).reshape(-1),
+                            np.asarray(boxes_xywhn, dtype=np.float64).reshape(-1, 4)))
+    buffer = io.BytesIO()
+    np.savetxt(buffer, rows, fmt="%d %.6f %.6f %.6f %.6f")
+    atomic_write_bytes(txt_path, buffer.getvalue())
+
+
+# minidom在3.13之前会把文本中的双引号转义为&quot;，保持与其输出一致
+_MINIDOM_ESCAPES_QUOTES = sys.version_info < (3, 13)
+
+
+def xml_escape(text):
+    """转义XML文本内容"""
+    text = text.replace("&", "&amp;").replace("<", "&lt;")
+    if _MINIDOM_ESCAPES_QUOTES:
+        text = text.replace('"', "&quot;")
+    return text.replace(">", "&gt;")
+
+
+def _render_xml_node(parts, tag, value, indent):
+    if isinstance(value, list):
+        if not value:
+            parts.append(f"{indent}<{tag}/>\n")
+            return
+        parts.append(f"{indent}<{tag}>\n")
+        child_indent = indent + "  "
+        for child_tag, child_value in value:
+            _render_xml_node(parts, child_tag, child_value, child_indent)
+        parts.append(f"{indent}</{tag}>\n")
+    elif value:
+        parts.append(f"{indent}<{tag}>{xml_escape(value)}</{tag}>\n")
+    else:
+        parts.append(f"{indent}<{tag}/>\n")
+
+
+def render_voc_xml(root_tag, children, encoding=None):
+    """
+    直接生成缩进XML，输出与 ET.tostring + minidom.toprettyxml(indent="  ") 逐字节一致，
+    但不需要序列化后再解析一遍
+
+    参数:
+        root_tag: 根节点标签
+        children: [(标签, 文本或子节点列表), ...]，文本为None或空串时输出自闭合标签
+        encoding: 与toprettyxml的encoding参数相同，只影响XML声明
+    返回:
+        XML字符串
+    """
+    if encoding is None:
+        parts = ['<?xml version="1.0" ?>\n']
+    else:
+        parts = [f'<?xml version="1.0" encoding="{encoding}"?>\n']
+    _render_xml_node(parts, root_tag, children, "")
+    return "".join(parts)
+
+
+def label_output_path(image_path, method):
+    """
+    标注文件路径：与图片同目录同名，TXT格式为.txt，VOC格式为.xml
+    """
+    suffix = ".txt" if method == "TXT" else ".xml"
+    return os.path.splitext(image_path)[0] + suffix
+
+
+# 模型文件哈希缓存，键为 (路径, 修改时间, 大小)
+_FILE_DIGEST_CACHE = {}
+
+
+def file_digest(file_path):
+    """
+    计算文件sha1（按路径、修改时间和大小缓存，模型文件只计算一次）
+    """
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime, stat.st_size)
+    digest = _FILE_DIGEST_CACHE.get(key)
+    if digest is None:
+        sha1 = hashlib.sha1()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha1.update(chunk)
+        digest = sha1.hexdigest()
+        _FILE_DIGEST_CACHE[key] = digest
+    return digest
+
+
+def path_key(file_path):
+    """统一路径写法（分隔符、大小写），用于精确匹配"""
+    return os.path.normcase(os.path.abspath(file_path))
+
+
+class ReviewStateLog(object):
+    """
+    素材确认状态（confirm_example.txt）：每行“图片路径 状态”，按追加日志使用，
+    同一路径以最后一行为准；修改只追加一行，重复行过多时压缩重写。
+    原有的每图一行的文件就是一份已压缩的日志，无需转换即可读取。
+    """
+    file_name = "confirm_example.txt"
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, self.file_name)
+        self.states, self.line_count = self.read(self.path)
+        self.file = None
+        if self.line_count > 2 * len(self.states) + 100:
+            self.compact()
+
+    @staticmethod
+    def read(path):
+        """
+        读取日志
+        返回:
+            ({图片路径: 状态}, 行数)
+        """
+        states = {}
+        line_count = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line_count += 1
+                    parts = line.rstrip("\n").rsplit(" ", 1)  # 路径中可能有空格
+                    if len(parts) == 2 and parts[1].isdigit():
+                        states[parts[0]] = int(parts[1])
+        return states, line_count
+
+    def get(self, image_path, default=0):
+        return self.states.get(image_path, default)
+
+    def set(self, image_path, state):
+        """更新一张图片的状态（追加一行并立即落盘）"""
+        if self.states.get(image_path) == state:
+            return
+        self.states[image_path] = state
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write(f"{image_path} {state}\n")
+        self.file.flush()
+        self.line_count += 1
+        if self.line_count > 2 * len(self.states) + 100:
+            self.compact()
+
+    def sync(self, image_paths):
+        """
+        与文件夹内的图片列表对齐：补上新图片（状态0），去掉已不存在的图片
+        """
+        if len(image_paths) == len(self.states) and all(path in self.states for path in image_paths):
+            return
+        self.states = {path: self.states.get(path, 0) for path in image_paths}
+        self.compact()
+
+    def compact(self):
+        """按当前状态重写文件（每图一行）"""
+        self.close()
+        atomic_write_text(self.path, "".join(f"{path} {state}\n" for path, state in self.states.items()))
+        self.line_count = len(self.states)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def load_confirmed_paths(folder):
+    """
+    读取文件夹下confirm_example.txt中已确认（标记为1）的图片
+    返回:
+        已确认图片的 path_key 集合
+    """
+    states, _ = ReviewStateLog.read(os.path.join(folder, ReviewStateLog.file_name))
+    return {path_key(path) for path, state in states.items() if state == 1}
+
+
+class PreannotateManifest(object):
+    """
+    预标注断点续跑清单（追加写入的JSON Lines文件，后写入的记录覆盖先前的）
+
+    每条记录保存输出时的图片大小、修改时间、模型哈希、conf、iou、保存格式以及标注文件的修改时间，
+    中途崩溃或取消后重新运行时，已是最新的图片直接跳过。
+    """
+    file_name = ".preannotate_manifest.jsonl"
+
+    def __init__(self, folder):
+        self.path = os.path.join(folder, self.file_name)
+        self.entries = {}
+        self.lock = threading.Lock()
+        line_count = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line_count += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # 崩溃时最后一行可能不完整
+                    self.entries[path_key(entry["image"])] = entry
+        # 重复记录过多时压缩清单
+        if line_count > 2 * len(self.entries) + 100:
+            atomic_write_text(self.path, "".join(json.dumps(entry, ensure_ascii=False) + "\n"
+                                                 for entry in self.entries.values()))
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    @staticmethod
+    def output_mtime(image_path, method):
+        output_path = label_output_path(image_path, method)
+        return os.path.getmtime(output_path) if os.path.exists(output_path) else None
+
+    def is_up_to_date(self, image_path, params):
+        """
+        判断图片是否无需重新推理
+
+        参数:
+            image_path: 图片路径
+            params: 本次运行参数 {"model": 模型哈希, "conf": ..., "iou": ..., "format": ...}
+        """
+        entry = self.entries.get(path_key(image_path))
+        if entry is None:
+            return False
+        stat = os.stat(image_path)
+        if entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+            return False  # 图片已变化，需要重新推理
+        output_mtime = self.output_mtime(image_path, params["format"])
+        if output_mtime is None:
+            return False  # 标注文件已不存在，需要重新生成
+        if all(entry.get(name) == value for name, value in params.items()):
+            return True
+        # 参数已变化，但标注文件在预标注之后被人工修改过，保留人工结果
+        return output_mtime != entry.get("output_mtime")
+
+    def record(self, image_path, params):
+        """记录一张已完成的图片（立即落盘）"""
+        stat = os.stat(image_path)
+        entry = {"image": image_path, "size": stat.st_size, "mtime": stat.st_mtime,
+                 "output_mtime": self.output_mtime(image_path, params["format"])}
+        entry.update(params)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.entries[path_key(image_path)] = entry
+            self.file.write(line)
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def _match_any(rel_path, name, patterns):
+    """相对路径或文件名匹配任一通配符"""
+    return any(fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+def scan_images(root, recursive=True, include=(), exclude=(), batch_size=256, flush_interval=0.05):
+    """
+    用 os.scandir 扫描素材文件夹，逐批产出图片路径（生成器，边扫描边产出）
+
+    按scandir返回的顺序产出，只在每批内部排序，大文件夹不必等整层列完再产出第一批；
+    先产出本层图片，再按名称顺序进入子文件夹。需要整体顺序时用 scan_sort_key 排序。
+    参数:
+        recursive: 是否扫描子文件夹
+        include: 通配符，图片的相对路径（'/'分隔）或文件名匹配其一才保留，为空时保留全部
+        exclude: 通配符，匹配的图片不保留，匹配的子文件夹整体跳过
+        batch_size/flush_interval: 凑满batch_size张或距上一批超过flush_interval秒就产出一批
+    """
+    batch = []
+    last_flush = time.perf_counter()
+    pending_dirs = [(root, "")]
+    visited = {os.path.realpath(root)}  # 已进入的符号链接文件夹（真实路径），避免链接成环
+    while pending_dirs:
+        folder, rel_folder = pending_dirs.pop()
+        sub_dirs = []
+        try:
+            with os.scandir(folder) as iterator:
+                for entry in iterator:
+                    rel_path = rel_folder + entry.name
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        continue
+                    if is_dir:
+                        if recursive and not _match_any(rel_path, entry.name, exclude):
+                            sub_dirs.append(entry)
+                        continue
+                    if not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                        continue
+                    if include and not _match_any(rel_path, entry.name, include):
+                        continue
+                    if exclude and _match_any(rel_path, entry.name, exclude):
+                        continue
+                    batch.append(entry.path)
+                    if len(batch) >= batch_size or time.perf_counter() - last_flush >= flush_interval:
+                        batch.sort()
+                        yield batch
+                        batch = []
+                        last_flush = time.perf_counter()
+        except OSError:
+            continue  # 无权限或扫描过程中被删除的子文件夹直接跳过
+        sub_dirs.sort(key=lambda entry: entry.name)
+        for entry in reversed(sub_dirs):
+            if entry.is_symlink():
+                real_path = os.path.realpath(entry.path)
+                if real_path in visited:
+                    continue
+                visited.add(real_path)
+            pending_dirs.append((entry.path, rel_folder + entry.name + "/"))
+    if batch:
+        batch.sort()
+        yield batch
+
+
+def scan_sort_key(root, path):
+    """
+    scan_images 结果的整体排序键：每个文件夹内先按名称排图片，再按名称排子文件夹
+    （与逐层排序后深度优先扫描的顺序相同）。
+    编码成字符串（图片名前加\x01，子文件夹名前加\x02、后加\x00）而不是元组，10万张图片排序快得多
+    """
+    # 扫描结果都以root开头，直接截取相对路径（relpath对10万张图片太慢）
+    rel_path = path[len(root):] if path.startswith(root) else os.path.relpath(path, root)
+    folder, _, name = rel_path.replace("\\", "/").lstrip("/").rpartition("/")
+    if not folder:
+        return "\x01" + name
+    return "".join("\x02" + part + "\x00" for part in folder.split("/")) + "\x01" + name
+
+
+class FolderScanner(threading.Thread):
+    """
+    后台线程扫描素材文件夹（见 scan_images），扫描到的图片按批放入队列，
+    界面用 poll 定时取出追加到列表，推理线程直接迭代本对象，扫描未结束就能开始处理
+    """
+
+    def __init__(self, root, recursive=True, include=(), exclude=()):
+        super().__init__(daemon=True)
+        self.root = root
+        self.recursive = recursive
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+        self.batches = queue.Queue()  # 每项为一批路径，扫描结束放入None
+        self.cancel_event = threading.Event()
+        self.found = 0
+        self.finished = False  # 调用方是否已取到结束标记
+        self.error = None
+
+    def run(self):
+        try:
+            for batch in scan_images(self.root, self.recursive, self.include, self.exclude):
+                if self.cancel_event.is_set():
+                    break
+                self.found += len(batch)
+                self.batches.put(batch)
+        except OSError as e:
+            self.error = e
+        finally:
+            self.batches.put(None)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def poll(self):
+        """
+        不阻塞地取出已扫描到的图片
+        返回:
+            (路径列表, 扫描是否已结束)
+        """
+        paths = []
+        while not self.finished:
+            try:
+                batch = self.batches.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                self.finished = True
+            else:
+                paths.extend(batch)
+        return paths, self.finished
+
+    def __iter__(self):
+        """逐张产出图片路径，扫描跟不上时阻塞等待，扫描结束后停止"""
+        while not self.finished:
+            batch = self.batches.get()
+            if batch is None:
+                self.finished = True
+            else:
+                yield from batch
+
+
+def decode_image(image_path):
+    """
+    读取图像为BGR数组（支持中文路径）
+    """
+    img = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("无法解码图像")
+    return img
+
+
+def draft_image(image, display_size):
+    """
+    JPEG缩小解码：让解码器直接输出不小于display_size的最小尺寸（1/2、1/4、1/8），
+    非JPEG图像不受影响；必须在图像数据加载前调用
+
+    参数:
+        image: Image.open 得到的图像（尚未load）
+        display_size: 需要的最小尺寸 (宽, 高)
+    """
+    if display_size[0] < image.width and display_size[1] < image.height:
+        image.draft(image.mode, (max(1, display_size[0]), max(1, display_size[1])))
+    return image
+
+
+class ImagePrefetcher(object):
+    """
+    后台预读相邻图片：解码并预先缩放到适应窗口的尺寸，放入按内存预算淘汰的LRU缓存，
+    切换图片时直接从内存显示
+    """
+
+    def __init__(self, budget_mb=512):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.cache = OrderedDict()  # (路径, 画布宽, 画布高) -> 缩放后的PIL图像
+        self.cache_bytes = 0
+        self.wanted = []  # 待预读的 (路径, 画布尺寸)，按优先级排列
+        self.failed = set()  # 解码失败的键，避免反复重试
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopped = False
+
+    @staticmethod
+    def fit_size(image_size, canvas_size):
+        """适应窗口时的显示尺寸（与 display_image_func 的计算方式一致）"""
+        width, height = image_size
+        canvas_width, canvas_height = canvas_size
+        scale = min(canvas_width / width, canvas_height / height) * 0.95  # 留出边距
+        return int(width * scale), int(height * scale)
+
+    @staticmethod
+    def image_bytes(image):
+        return image.width * image.height * len(image.getbands())
+
+    def schedule(self, paths, canvas_size):
+        """替换预读队列（旧的未完成任务直接丢弃）"""
+        with self.condition:
+            self.wanted = [(path, canvas_size) for path in paths]
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def get(self, path, canvas_size):
+        """取缓存中的预缩放图像，未命中返回None"""
+        key = (path, canvas_size[0], canvas_size[1])
+        with self.condition:
+            image = self.cache.get(key)
+            if image is not None:
+                self.cache.move_to_end(key)
+            return image
+
+    def put(self, path, canvas_size, image):
+        """放入缓存，超出内存预算时淘汰最久未使用的图像"""
+        key = (path, canvas_size[0], canvas_size[1])
+        size = self.image_bytes(image)
+        if size > self.budget_bytes:
+            return
+        with self.condition:
+            if key in self.cache:
+                self.cache_bytes -= self.image_bytes(self.cache.pop(key))
+            self.cache[key] = image
+            self.cache_bytes += size
+            while self.cache_bytes > self.budget_bytes:
+                _, evicted = self.cache.popitem(last=False)
+                self.cache_bytes -= self.image_bytes(evicted)
+
+    def clear(self):
+        """释放全部缓存"""
+        with self.condition:
+            self.cache.clear()
+            self.cache_bytes = 0
+            self.wanted = []
+            self.failed.clear()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.wanted = []
+            self.condition.notify()
+
+    def next_job(self):
+        while self.wanted:
+            path, canvas_size = self.wanted.pop(0)
+            key = (path, canvas_size[0], canvas_size[1])
+            if key not in self.cache and key not in self.failed:
+                return path, canvas_size
+        return None
+
+    def decode(self, path, canvas_size):
+        """解码并缩放到适应窗口的尺寸"""
+        with Image.open(path) as image:
+            fit_size = self.fit_size(image.size, canvas_size)
+            draft_image(image, fit_size)
+            return image.resize(fit_size, Image.LANCZOS)
+
+    def run(self):
+        while True:
+            with self.condition:
+                job = self.next_job()
+                while job is None and not self.stopped:
+                    self.condition.wait()
+                    job = self.next_job()
+                if self.stopped:
+                    return
+            path, canvas_size = job
+            try:
+                image = self.decode(path, canvas_size)
+            except Exception:
+                with self.condition:
+                    self.failed.add((path, canvas_size[0], canvas_size[1]))
+                continue
+            self.put(path, canvas_size, image)
+
+
+class TiledImageRenderer(object):
+    """
+    大图分块渲染：每张图只构建一次降采样金字塔，缩放时只对与可见区域相交的图块重采样，
+    并按缩放级别缓存已渲染的图块（缓存数量随视口大小调整）
+    """
+    tile_size = 256  # 图块边长（显示像素）
+
+    def __init__(self, image, full_size, max_tiles=64):
+        self.image = image  # 解码后的图像（可能是缩小解码的结果）
+        self.full_size = full_size  # 原图尺寸，scale均相对原图
+        self.levels = None  # 金字塔，第k层约为解码图像的1/2^k
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()  # (缩放比例, 列, 行, 重采样方式) -> ImageTk.PhotoImage
+
+    def build_pyramid(self):
+        """构建降采样金字塔（每张图只构建一次）"""
+        if self.levels is None:
+            base = self.image
+            if base.mode not in ("RGB", "RGBA", "L"):
+                base = base.convert("RGBA")
+            levels = [base]
+            while max(levels[-1].size) > self.tile_size * 2:
+                levels.append(levels[-1].reduce(2))
+            self.levels = levels
+        return self.levels
+
+    def source_level(self, scale):
+        """选择分辨率不低于显示比例的最小金字塔层"""
+        levels = self.build_pyramid()
+        base_scale = levels[0].width / self.full_size[0]
+        level = 0
+        while level + 1 < len(levels) and scale <= base_scale * 0.5 ** (level + 1):
+            level += 1
+        return levels[level]
+
+    def tile(self, scale, column, row, display_size, resample=Image.LANCZOS):
+        """
+        获取一个图块
+
+        参数:
+            scale: 显示比例（相对原图）
+            column/row: 图块列号和行号
+            display_size: 整图缩放后的显示尺寸
+        """
+        key = (scale, column, row, resample)
+        photo = self.tiles.get(key)
+        if photo is not None:
+            self.tiles.move_to_end(key)
+            return photo
+        source = self.source_level(scale)
+        ratio_x = source.width / self.full_size[0] / scale  # 显示像素 -> 金字塔层像素
+        ratio_y = source.height / self.full_size[1] / scale
+        x0, y0 = column * self.tile_size, row * self.tile_size
+        x1 = min(x0 + self.tile_size, display_size[0])
+        y1 = min(y0 + self.tile_size, display_size[1])
+        region = source.resize((x1 - x0, y1 - y0), resample,
+                               box=(x0 * ratio_x, y0 * ratio_y, x1 * ratio_x, y1 * ratio_y))
+        photo = ImageTk.PhotoImage(region)
+        self.tiles[key] = photo
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+        return photo
+
+
+# 标注框问题的标志位及说明，一个框可同时有多个问题
+BOX_ISSUES = (
+    (1, "左边越界(x1<0)"),
+    (2, "上边越界(y1<0)"),
+    (4, "右边越界(x2>图像宽)"),
+    (8, "下边越界(y2>图像高)"),
+    (16, "宽度不为正(x1>=x2)"),
+    (32, "高度不为正(y1>=y2)"),
+)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff')
+
+
+def box_issue_flags(boxes, width, height):
+    """
+    一次检查所有标注框
+
+    参数:
+        boxes: (N,4) x1, y1, x2, y2（原图坐标）
+    返回:
+        (N,) uint8 问题标志位，0表示有效，各位含义见BOX_ISSUES
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    conditions = (boxes[:, 0] < 0, boxes[:, 1] < 0, boxes[:, 2] > width, boxes[:, 3] > height,
+                  boxes[:, 0] >= boxes[:, 2], boxes[:, 1] >= boxes[:, 3])
+    flags = np.zeros(len(boxes), dtype=np.uint8)
+    for (bit, _), condition in zip(BOX_ISSUES, conditions):
+        flags |= condition.astype(np.uint8) * np.uint8(bit)
+    return flags
+
+
+def describe_box_issues(flags):
+    """把一个框的问题标志位转为说明文字"""
+    return "、".join(reason for bit, reason in BOX_ISSUES if flags & bit)
+
+
+def clip_boxes(boxes, width, height):
+    """
+    修复标注框：先按坐标大小排好x1<x2、y1<y2，再裁剪到图像范围内
+
+    返回:
+        (修复后的框, 保留掩码)，裁剪后宽或高为0的框保留掩码为False
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    xs = np.clip(np.sort(boxes[:, 0::2], axis=1), 0, width)
+    ys = np.clip(np.sort(boxes[:, 1::2], axis=1), 0, height)
+    fixed = np.column_stack((xs[:, 0], ys[:, 0], xs[:, 1], ys[:, 1])).astype(boxes.dtype)
+    keep = (fixed[:, 2] > fixed[:, 0]) & (fixed[:, 3] > fixed[:, 1])
+    return fixed, keep
+
+
+def image_header_size(image_path):
+    """只读取文件头获取图片尺寸，不解码像素"""
+    with Image.open(image_path) as image:
+        return image.size
+
+
+def validate_label_file(image_path, method, repair=False):
+    """
+    校验（并可修复）一张图片的标注文件，不需要打开界面
+
+    参数:
+        method: 标注格式 "JSON" / "VOC" / "YOLO"
+        repair: 为True时把有问题的框裁剪到图像范围内并写回（裁剪后无面积的框删除），
+                有效的框和文件中的其他内容保持原样
+    返回:
+        没有标注文件时为None，否则为字典：
+        image 图片路径, path 标注文件路径, boxes 框数量, issues [(框序号, 问题标志位), ...], dropped 修复时删除的框数量
+    """
+    stem = os.path.splitext(image_path)[0]
+    if method == "JSON":
+        label_path = stem + "_annotations.json"
+        if not os.path.exists(label_path):
+            return None
+        with open(label_path, "r", encoding="utf-8") as f:
+            annotation_data = json.load(f)
+        annotations = AnnotationSet.from_records(annotation_data.get("annotations", []))
+        width, height = annotation_data.get("image_size") or image_header_size(image_path)
+        boxes = annotations.boxes
+    elif method == "VOC":
+        label_path = stem + ".xml"
+        if not os.path.exists(label_path):
+            return None
+        # 保留注释和处理指令，修复时只改动有问题的bndbox
+        parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True, insert_pis=True))
+        xml_root = ET.parse(label_path, parser=parser).getroot()
+        size = xml_root.find("size")
+        width = int(size.find("width").text) if size is not None else 0
+        height = int(size.find("height").text) if size is not None else 0
+        if width <= 0 or height <= 0:
+            width, height = image_header_size(image_path)
+        objects = xml_root.findall("object")
+        boxes = np.array([[int(ob.find("bndbox/" + name).text) for name in ("xmin", "ymin", "xmax", "ymax")]
+                          for ob in objects], dtype=np.int64).reshape(-1, 4)
+    else:
+        label_path = stem + ".txt"
+        if not os.path.exists(label_path):
+            return None
+        # 在归一化坐标下检查和修复，不需要读取图片尺寸；按字节处理，修复时只替换有问题的行
+        with open(label_path, "rb") as f:
+            lines = f.read().splitlines(keepends=True)
+        row_lines = [index for index, line in enumerate(lines) if line.strip()]
+        values = np.array([[float(token) for token in lines[index].split()[:5]] for index in row_lines],
+                          dtype=np.float64).reshape(-1, 5)
+        boxes = np.hstack((values[:, 1:3] - 0.5 * values[:, 3:5], values[:, 1:3] + 0.5 * values[:, 3:5]))
+        # 写入时保留6位小数，边界上不超过1e-6的误差不算越界
+        clipped = np.clip(boxes, 0.0, 1.0)
+        boxes = np.where(np.abs(boxes - clipped) <= 1e-6, clipped, boxes)
+        width = height = 1.0
+
+    flags = box_issue_flags(boxes, width, height)
+    invalid = np.flatnonzero(flags)
+    result = {"image": image_path, "path": label_path, "boxes": len(boxes),
+              "issues": list(zip(invalid.tolist(), flags[invalid].tolist())), "dropped": 0}
+    if not repair or not len(invalid):
+        return result
+
+    if method == "JSON":
+        _, result["dropped"] = annotations.clip_to_image(width, height)
+        annotation_data["annotations"] = annotations.to_records()
+        atomic_write_text(label_path, json.dumps(annotation_data, indent=2, ensure_ascii=False))
+    elif method == "VOC":
+        fixed, keep = clip_boxes(boxes[invalid], width, height)
+        for index, box, kept in zip(invalid.tolist(), fixed.tolist(), keep.tolist()):
+            ob = objects[index]
+            if not kept:
+                # 前一个节点接上被删节点后的空白，保持缩进
+                position = list(xml_root).index(ob)
+                if position > 0:
+                    xml_root[position - 1].tail = ob.tail
+                xml_root.remove(ob)
+                continue
+            for name, value in zip(("xmin", "ymin", "xmax", "ymax"), box):
+                ob.find("bndbox/" + name).text = str(value)
+        # 原样保留XML声明，按声明中的编码写回（没有声明时为utf-8）
+        with open(label_path, "rb") as f:
+            raw = f.read()
+        match = re.match(rb"\s*<\?xml[^>]*\?>[ \t]*\r?\n?", raw)
+        declaration = match.group(0) if match else b""
+        match = re.search(rb"""encoding=["']([A-Za-z0-9._-]+)["']""", declaration)
+        encoding = match.group(1).decode("ascii") if match else "utf-8"
+        body = ET.tostring(xml_root, encoding="unicode").encode(encoding)
+        atomic_write_bytes(label_path, declaration + body + (b"\n" if raw.endswith(b"\n") else b""))
+        result["dropped"] = int(np.count_nonzero(~keep))
+    else:
+        fixed, keep = clip_boxes(boxes[invalid], width, height)
+        xywh = np.column_stack(((fixed[:, :2] + fixed[:, 2:]) / 2, fixed[:, 2:] - fixed[:, :2]))
+        for index, box, kept in zip(invalid.tolist(), xywh.tolist(), keep.tolist()):
+            line_index = row_lines[index]
+            line = lines[line_index]
+            if not kept:
+                lines[line_index] = b""
+                continue
+            # 类别和多余的列（如置信度）保持原样，只替换坐标
+            tokens = line.split()
+            ending = line[len(line.rstrip(b"\r\n")):]
+            coords = " ".join(f"{value:.6f}" for value in box).encode("ascii")
+            lines[line_index] = b" ".join([tokens[0], coords] + tokens[5:]) + ending
+        atomic_write_bytes(label_path, b"".join(lines))
+        result["dropped"] = int(np.count_nonzero(~keep))
+    return result
+
+
+def validate_label_folder(folder, method, repair=False, recursive=True, include=(), exclude=()):
+    """
+    校验（并可修复）文件夹下所有图片的标注文件，图片按 scan_images 扫描（与文件列表一致，可包含子文件夹）
+
+    返回:
+        (有问题的文件结果列表, 已检查的标注文件数量)，结果格式同validate_label_file；
+        读取失败的文件结果中带error
+    """
+    problems = []
+    checked = 0
+    for image_path in (path for batch in scan_images(folder, recursive, include, exclude) for path in batch):
+        try:
+            result = validate_label_file(image_path, method, repair)
+        except Exception as e:
+            problems.append({"image": image_path, "path": image_path, "boxes": 0, "issues": [], "dropped": 0,
+                             "error": str(e)})
+            continue
+        if result is None:
+            continue
+        checked += 1
+        if result["issues"]:
+            problems.append(result)
+    problems.sort(key=lambda result: scan_sort_key(folder, result["image"]))
+    return problems, checked
+
+
+class AnnotationRecord(object):
+    """
+    AnnotationSet 中一条标注的字典视图，兼容原先 {"label", "bbox", "id", "canvas_ids"} 的用法；
+    label/bbox/id 读写底层数组，其余字段（如canvas_ids）保存在视图自身
+    """
+    columns = ("label", "bbox", "id")
+
+    def __init__(self, store, row, fields=None):
+        self.store = store
+        self.row = row  # 在store中的行号，删除前面的标注后会前移；被删除后为None
+        self.fields = fields or {}
+
+    def __getitem__(self, key):
+        store, row = self.store, self.row
+        if key == "label":
+            return store.labels[store.class_ids[row]]
+        if key == "bbox":
+            return store.boxes[row].tolist()
+        if key == "id":
+            return int(store.ids[row])
+        return self.fields[key]
+
+    def __setitem__(self, key, value):
+        store, row = self.store, self.row
+        if key == "label":
+            store.class_ids[row] = store.intern(value)
+        elif key == "bbox":
+            store.boxes[row] = value
+        elif key == "id":
+            store.ids[row] = value
+        else:
+            self.fields[key] = value
+
+    def __contains__(self, key):
+        return key in self.columns or key in self.fields
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def to_dict(self):
+        record = {"label": self["label"], "bbox": self["bbox"], "id": self["id"]}
+        record.update(self.fields)
+        return record
+
+
+class AnnotationSet(object):
+    """
+    一张图的标注（列式存储）：框为 (N,4) int32 原图坐标，类别为 int16 下标指向去重的标签表；
+    提供向量化的越界检查、归一化、缩放和筛选，按下标/迭代得到 AnnotationRecord 字典视图
+    """
+
+    def __init__(self, boxes=None, class_ids=None, labels=None, ids=None):
+        self.boxes = np.zeros((0, 4), dtype=np.int32) if boxes is None else np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        count = len(self.boxes)
+        self.class_ids = np.zeros(count, dtype=np.int16) if class_ids is None else np.asarray(class_ids, dtype=np.int16)
+        self.ids = np.arange(count, dtype=np.int32) if ids is None else np.asarray(ids, dtype=np.int32)
+        self.labels = list(labels or [])  # 标签表，class_ids是其下标
+        self.label_index = {}  # 标签名 -> 标签表下标
+        for index, label in enumerate(self.labels):
+            self.label_index.setdefault(label, index)
+        self.records = [AnnotationRecord(self, row) for row in range(count)]
+
+    @classmethod
+    def from_records(cls, records):
+        """由字典列表（JSON中的annotations）构建，非列字段原样保留"""
+        annotation_set = cls()
+        class_ids = [annotation_set.intern(record["label"]) for record in records]
+        annotation_set.boxes = np.array([record["bbox"] for record in records], dtype=np.int32).reshape(-1, 4)
+        annotation_set.class_ids = np.array(class_ids, dtype=np.int16)
+        annotation_set.ids = np.array([record.get("id", row) for row, record in enumerate(records)], dtype=np.int32)
+        annotation_set.records = [
+            AnnotationRecord(annotation_set, row,
+                             {key: value for key, value in record.items() if key not in AnnotationRecord.columns})
+            for row, record in enumerate(records)]
+        return annotation_set
+
+    def to_records(self):
+        """转为字典列表（用于JSON保存）"""
+        labels = self.labels
+        records = []
+        for record, box, class_id, annotation_id in zip(self.records, self.boxes.tolist(), self.class_ids.tolist(),
+                                                       self.ids.tolist()):
+            data = {"label": labels[class_id], "bbox": box, "id": annotation_id}
+            data.update(record.fields)
+            records.append(data)
+        return records
+
+    def intern(self, label):
+        """返回标签在标签表中的下标，不存在时追加"""
+        index = self.label_index.get(label)
+        if index is None:
+            index = len(self.labels)
+            self.labels.append(label)
+            self.label_index[label] = index
+        return index
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(list(self.records))
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def __contains__(self, record):
+        return isinstance(record, AnnotationRecord) and record.store is self and record.row is not None
+
+    def index(self, record):
+        if record not in self:
+            raise ValueError("标注不在当前标注集中")
+        return record.row
+
+    def add(self, label, bbox, annotation_id=None):
+        """追加一条标注，返回其字典视图"""
+        row = len(self.records)
+        self.boxes = np.concatenate((self.boxes, np.asarray([bbox], dtype=np.int32)))
+        self.class_ids = np.append(self.class_ids, np.int16(self.intern(label)))
+        self.ids = np.append(self.ids, np.int32(row if annotation_id is None else annotation_id))
+        record = AnnotationRecord(self, row)
+        self.records.append(record)
+        return record
+
+    def remove(self, record):
+        """删除一条标注，后面的标注行号前移"""
+        row = self.index(record)
+        self.boxes = np.delete(self.boxes, row, axis=0)
+        self.class_ids = np.delete(self.class_ids, row)
+        self.ids = np.delete(self.ids, row)
+        del self.records[row]
+        for later in self.records[row:]:
+            later.row -= 1
+        record.row = None
+
+    def label_names(self):
+        """每条标注的标签名列表"""
+        labels = self.labels
+        return [labels[class_id] for class_id in self.class_ids.tolist()]
+
+    def issue_flags(self, width, height):
+        """每个框的问题标志位（见BOX_ISSUES），0表示有效"""
+        return box_issue_flags(self.boxes, width, height)
+
+    def invalid_mask(self, width, height):
+        """超出图像边界或宽高不为正的框"""
+        return self.issue_flags(width, height) != 0
+
+    def clip_to_image(self, width, height):
+        """
+        把所有框裁剪到图像范围内，裁剪后无面积的框删除
+
+        返回:
+            (坐标被修改的框数量, 删除的框数量)
+        """
+        fixed, keep = clip_boxes(self.boxes, width, height)
+        changed = int(np.count_nonzero(np.any(fixed != self.boxes, axis=1) & keep))
+        self.boxes = fixed
+        self.keep(keep)
+        return changed, int(np.count_nonzero(~keep))
+
+    def keep(self, mask):
+        """只保留掩码为True的标注（原地修改，被删除的视图行号置为None）"""
+        mask = np.asarray(mask, dtype=bool)
+        self.boxes = self.boxes[mask]
+        self.class_ids = self.class_ids[mask]
+        self.ids = self.ids[mask]
+        kept = []
+        for record, kept_flag in zip(self.records, mask.tolist()):
+            if kept_flag:
+                record.row = len(kept)
+                kept.append(record)
+            else:
+                record.row = None
+        self.records = kept
+
+    def normalized_xywh(self, width, height):
+        """YOLO格式的归一化 (中心x, 中心y, 宽, 高)"""
+        boxes = self.boxes.astype(np.float64)
+        return np.column_stack(((boxes[:, 0] + boxes[:, 2]) / 2.0 / width,
+                                (boxes[:, 1] + boxes[:, 3]) / 2.0 / height,
+                                (boxes[:, 2] - boxes[:, 0]) / width,
+                                (boxes[:, 3] - boxes[:, 1]) / height))
+
+    def scaled(self, scale, offset_x=0.0, offset_y=0.0):
+        """按缩放比例和偏移换算到显示坐标 (N,4) float64"""
+        return self.boxes * float(scale) + np.array([offset_x, offset_y, offset_x, offset_y], dtype=np.float64)
+
+    def mapped_class_ids(self, label_to_id):
+        """
+        按外部标签字典换算类别id
+
+        返回:
+            (类别id数组, 不在字典中的标签名集合)
+        """
+        lookup = np.array([label_to_id.get(label, -1) for label in self.labels] or [-1], dtype=np.int64)
+        class_ids = lookup[self.class_ids]
+        missing = {self.labels[index] for index in np.unique(self.class_ids[class_ids < 0]).tolist()}
+        return class_ids, missing
+
+    def filter(self, mask):
+        """按布尔掩码筛选，返回新的标注集（共享标签表内容）"""
+        rows = np.flatnonzero(mask)
+        subset = AnnotationSet(self.boxes[rows], self.class_ids[rows], self.labels, self.ids[rows])
+        for new_record, row in zip(subset.records, rows.tolist()):
+            new_record.fields = dict(self.records[row].fields)
+        return subset
+
+
+class AnnotationGridIndex(object):
+    """
+    标注框边线的均匀网格索引（原图坐标）：每个框只登记其四条边经过的网格，
+    命中测试只检查鼠标附近几个网格里的框，与标注总数无关
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}  # (列, 行) -> {标注序号}
+        self.entries = {}  # 标注序号 -> (标注, 登记的网格)
+        self.keys = {}  # id(标注) -> 标注序号，序号按插入顺序递增，命中多个时取最早绘制的
+        self.next_key = 0
+
+    def edge_cells(self, bbox):
+        """框的四条边经过的网格"""
+        x1, y1, x2, y2 = bbox
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        size = self.cell_size
+        c1, r1, c2, r2 = int(x1 // size), int(y1 // size), int(x2 // size), int(y2 // size)
+        cells = set()
+        for column in range(c1, c2 + 1):
+            cells.add((column, r1))
+            cells.add((column, r2))
+        for row in range(r1, r2 + 1):
+            cells.add((c1, row))
+            cells.add((c2, row))
+        return cells
+
+    def insert(self, annotation):
+        """登记一个标注（使用其当前bbox）"""
+        key = self.keys.get(id(annotation))
+        if key is None:
+            key = self.next_key
+            self.next_key += 1
+            self.keys[id(annotation)] = key
+        cells = self.edge_cells(annotation["bbox"])
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(key)
+        self.entries[key] = (annotation, cells)
+
+    def remove(self, annotation):
+        """移除一个标注"""
+        key = self.keys.pop(id(annotation), None)
+        if key is None:
+            return
+        _, cells = self.entries.pop(key)
+        for cell in cells:
+            bucket = self.cells[cell]
+            bucket.discard(key)
+            if not bucket:
+                del self.cells[cell]
+
+    def update(self, annotation):
+        """标注移动或调整大小后重新登记（保留原序号）"""
+        key = self.keys.get(id(annotation))
+        if key is not None:
+            for cell in self.entries[key][1]:
+                bucket = self.cells[cell]
+                bucket.discard(key)
+                if not bucket:
+                    del self.cells[cell]
+        self.insert(annotation)
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+        self.keys.clear()
+
+    def hit(self, x, y, tolerance):
+        """
+        返回边线距离点(x, y)不超过tolerance的最早登记的标注，没有则返回None（均为原图坐标）
+        """
+        size = self.cell_size
+        best_key = None
+        for column in range(int((x - tolerance) // size), int((x + tolerance) // size) + 1):
+            for row in range(int((y - tolerance) // size), int((y + tolerance) // size) + 1):
+                for key in self.cells.get((column, row), ()):
+                    if best_key is not None and key >= best_key:
+                        continue
+                    x1, y1, x2, y2 = self.entries[key][0]["bbox"]
+                    x1, x2 = min(x1, x2), max(x1, x2)
+                    y1, y2 = min(y1, y2), max(y1, y2)
+                    if not (x1 - tolerance <= x <= x2 + tolerance and y1 - tolerance <= y <= y2 + tolerance):
+                        continue
+                    if x1 + tolerance < x < x2 - tolerance and y1 + tolerance < y < y2 - tolerance:
+                        continue  # 在框内部，未碰到边线
+                    best_key = key
+        return None if best_key is None else self.entries[best_key][0]
+
+
+class CanvasItemMap(object):
+    """
+    画布图元id与标注的双向映射：图元id -> 标注，标注 -> (矩形框id, 文字id)
+    """
+
+    def __init__(self):
+        self.annotations = {}  # 图元id -> 标注
+        self.items = {}  # id(标注) -> (矩形框id, 文字id)
+
+    def bind(self, annotation, rect_id, text_id):
+        self.unbind(annotation)
+        self.items[id(annotation)] = (rect_id, text_id)
+        self.annotations[rect_id] = annotation
+        self.annotations[text_id] = annotation
+
+    def unbind(self, annotation):
+        """移除一个标注的映射，返回其图元id，未登记时返回None"""
+        items = self.items.pop(id(annotation), None)
+        if items is not None:
+            for item in items:
+                self.annotations.pop(item, None)
+        return items
+
+    def annotation_of(self, item):
+        return self.annotations.get(item)
+
+    def items_of(self, annotation):
+        return self.items.get(id(annotation))
+
+    def label_of(self, rect_id):
+        """矩形框对应的文字图元id"""
+        return self.items[id(self.annotations[rect_id])][1]
+
+    def clear(self):
+        self.annotations.clear()
+        self.items.clear()
+
+
+class VirtualFileList(tk.Canvas):
+    """
+    虚拟化文件列表：数据只保存在内存（文件名列表 + 状态数组），画布上只保留可见的几十行图元并循环复用，
+    滚动时只改这些图元的文字和颜色，打开10万张图片的文件夹也不需要逐行插入/着色。
+    接口与所替换的Listbox用法保持一致（curselection/selection_set/see/yview，选中时触发<<ListboxSelect>>）
+    """
+    status_colors = ("#FF9999", "#99FF99")  # 状态0未确认，1已确认
+    unknown_color = "#DDDDDD"  # 超出status_colors的状态值
+    select_color = "#3399FF"
+
+    def __init__(self, master, **kwargs):
+        kwargs.setdefault("bg", "white")
+        kwargs.setdefault("highlightthickness", 0)
+        kwargs.setdefault("takefocus", 1)
+        super().__init__(master, **kwargs)
+        self.text_font = tkfont.nametofont("TkDefaultFont")
+        self.row_height = self.text_font.metrics("linespace") + 2
+        self.names = []
+        # 行状态缓冲区按倍数扩容，count为实际行数；边扫描边追加时不用每批重新分配整个数组
+        self.status_buffer = np.zeros(0, dtype=np.uint8)
+        self.count = 0
+        self.selected = None
+        self.offset = 0  # 列表顶部滚出的像素数
+        self.rows = []  # 复用的行图元 (背景矩形id, 文字id)
+        self.content_width = 0
+        self.yscrollcommand = None
+        self.bind("<Configure>", lambda event: self.redraw())
+        self.bind("<Button-1>", self.on_click)
+        self.bind("<MouseWheel>", lambda event: self.yview("scroll", -1 if event.delta > 0 else 1, "units"))
+        self.bind("<Button-4>", lambda event: self.yview("scroll", -1, "units"))
+        self.bind("<Button-5>", lambda event: self.yview("scroll", 1, "units"))
+        # 与Listbox一致的键盘导航
+        self.bind("<Up>", lambda event: self.move_selection(-1))
+        self.bind("<Down>", lambda event: self.move_selection(1))
+        self.bind("<Prior>", lambda event: self.move_selection(-self.page_rows()))
+        self.bind("<Next>", lambda event: self.move_selection(self.page_rows()))
+        self.bind("<Home>", lambda event: self.move_selection(-self.count))
+        self.bind("<End>", lambda event: self.move_selection(self.count))
+
+    @property
+    def status(self):
+        """前count行的状态（缓冲区视图，可直接赋值修改）"""
+        return self.status_buffer[:self.count]
+
+    def set_items(self, names, status=None):
+        """替换全部行"""
+        self.names = names
+        self.count = len(names)
+        if status is None:
+            self.status_buffer = np.zeros(self.count, dtype=np.uint8)
+        else:
+            self.status_buffer = np.array(status, dtype=np.uint8).reshape(-1)
+        self.selected = None
+        self.offset = 0
+        # 按最长文件名估算内容宽度，供水平滚动使用（不逐行测量）
+        longest = max(names, key=len) if names else ""
+        self.content_width = self.text_font.measure(longest) + 8
+        self.redraw()
+
+    def append_items(self, names):
+        """在末尾追加行（文件夹边扫描边加入），不改变选中项和滚动位置"""
+        if not names:
+            return
+        self.names.extend(names)
+        new_count = self.count + len(names)
+        if new_count > len(self.status_buffer):
+            buffer = np.zeros(max(new_count, 2 * len(self.status_buffer), 1024), dtype=np.uint8)
+            buffer[:self.count] = self.status_buffer[:self.count]
+            self.status_buffer = buffer
+        else:
+            self.status_buffer[self.count:new_count] = 0
+        self.count = new_count
+        self.content_width = max(self.content_width, self.text_font.measure(max(names, key=len)) + 8)
+        self.redraw()
+
+    def set_status(self, index, value):
+        self.status_buffer[index] = value
+        self.redraw()
+
+    def curselection(self):
+        return () if self.selected is None else (self.selected,)
+
+    def selection_clear(self, first=0, last=None):
+        self.selected = None
+        self.redraw()
+
+    def selection_set(self, index):
+        if 0 <= index < self.count:
+            self.selected = index
+        self.redraw()
+
+    def see(self, index):
+        """滚动使第index行可见"""
+        view_height = self.winfo_height()
+        top = index * self.row_height
+        if top < self.offset:
+            self.offset = top
+        elif top + self.row_height > self.offset + view_height:
+            self.offset = top + self.row_height - view_height
+        self.redraw()
+
+    def yview(self, *args):
+        """Scrollbar回调：moveto / scroll n units|pages"""
+        total = self.count * self.row_height
+        view_height = max(self.winfo_height(), 1)
+        if not args:
+            return (self.offset / total, min(1.0, (self.offset + view_height) / total)) if total else (0.0, 1.0)
+        if args[0] == "moveto":
+            self.offset = float(args[1]) * total
+        elif args[0] == "scroll":
+            step = view_height if args[2] == "pages" else self.row_height
+            self.offset += int(args[1]) * step
+        self.redraw()
+
+    def on_click(self, event):
+        self.focus_set()
+        row = int((self.offset + event.y) // self.row_height)
+        if 0 <= row < self.count:
+            self.selected = row
+            self.redraw()
+            self.event_generate("<<ListboxSelect>>")
+
+    def page_rows(self):
+        return max(1, self.winfo_height() // self.row_height - 1)
+
+    def move_selection(self, delta):
+        """键盘移动选中行并滚动到可见，选中项变化时触发<<ListboxSelect>>"""
+        if not self.count:
+            return "break"
+        row = 0 if self.selected is None else max(0, min(self.count - 1, self.selected + delta))
+        if row != self.selected:
+            self.selected = row
+            self.see(row)
+            self.event_generate("<<ListboxSelect>>")
+        return "break"
+
+    def redraw(self):
+        """只重绘可见行"""
+        view_width, view_height = self.winfo_width(), self.winfo_height()
+        total = self.count * self.row_height
+        self.offset = int(max(0, min(self.offset, total - view_height)))
+        first = self.offset // self.row_height
+        shift = -(self.offset % self.row_height)
+        visible = view_height // self.row_height + 2
+        row_width = max(view_width, self.content_width)
+        while len(self.rows) < visible:
+            self.rows.append((self.create_rectangle(0, 0, 0, 0, width=0),
+                              self.create_text(0, 0, anchor=tk.W, font=self.text_font)))
+        for slot, (rect_id, text_id) in enumerate(self.rows):
+            row = first + slot
+            if slot >= visible or row >= self.count:
+                self.itemconfig(rect_id, state=tk.HIDDEN)
+                self.itemconfig(text_id, state=tk.HIDDEN)
+                continue
+            y = shift + slot * self.row_height
+            if row == self.selected:
+                color = self.select_color
+            else:
+                state = self.status_buffer[row]
+                color = self.status_colors[state] if state < len(self.status_colors) else self.unknown_color
+            self.coords(rect_id, 0, y, row_width, y + self.row_height)
+            self.itemconfig(rect_id, fill=color, state=tk.NORMAL)
+            self.coords(text_id, 2, y + self.row_height / 2)
+            self.itemconfig(text_id, text=self.names[row], state=tk.NORMAL)
+        self.configure(scrollregion=(0, 0, row_width, view_height))
+        if self.yscrollcommand is not None:
+            self.yscrollcommand(*self.yview())
 
 
 class ImageAnnotator(ttk.Frame):
@@ -26,11 +1401,13 @@ class ImageAnnotator(ttk.Frame):
         # 变量初始化
         self.state = False
         self.image_path = ""  # 当前图像路径
-        self.original_image = None  # 原始图像
+        self.original_image = None  # 原始图像（JPEG可能是缩小解码的结果）
+        self.image_size = (0, 0)  # 原图尺寸，标注坐标始终基于该尺寸
+        self.decode_scale = 1.0  # original_image相对原图的解码比例
         self.display_image = None  # 显示图像
         self.tk_image = None  # 用于显示的PIL图像
         self.canvas = None
-        self.annotations = []
+        self.annotations = AnnotationSet()
         self.current_annotation = None
         self.start_x = None
         self.start_y = None
@@ -42,13 +1419,44 @@ class ImageAnnotator(ttk.Frame):
         self.drag_offset_y = 0  # 添加一个变量来跟踪是否修改了标注
         self.modified = False  # 添加一个变量来跟踪是否修改了标注
         self.image_files = []  # 存储文件夹中的所有图像文件
+        self.image_file_index = {}  # 图像路径 -> 在image_files中的下标
+        self.image_folder = None  # 打开的素材文件夹，打开单张图片时为None
+        # 文件夹后台扫描，扫描到的图片逐批追加到列表（见 scan_images）
+        self.scan_recursive = True
+        self.scan_include = ()
+        self.scan_exclude = ()
+        self.folder_scanner = None
+        self.scan_job = None
+        self.review_log = None  # 当前文件夹的确认状态日志
         self.current_image_index = 0  # 当前图像的索引
         self.mode = "select"  # 添加一个变量来跟踪当前模式
         self.updating_selection = False  # 添加一个变量来跟踪是否正在更新选择
+        self.highlighted_annotation = None  # 当前高亮的标注，切换选中时只重置它
+        self.report_max_lines = 20  # 校验报告对话框最多列出的行数
+        self.canvas_items = CanvasItemMap()  # 画布图元与标注的对应关系
         # 调整大小相关变量
         self.resizing = False
         self.resize_mode = None  # 'nw', 'n', 'ne', 'w', 'e', 'sw', 's', 'se'
         self.resize_handle_size = 8  # 调整手柄大小
+        # 标注框命中测试的空间索引（原图坐标），命中容差为显示像素
+        self.hit_index = AnnotationGridIndex()
+        self.hit_tolerance = 4
+        # 相邻图片预读
+        self.prefetcher = ImagePrefetcher(budget_mb=512)
+        self.prefetch_radius = 3  # 预读前后各K张
+        # 大图分块渲染
+        self.tile_renderer = None
+        self.tile_items = {}  # 画布上的图块 (缩放比例, 列, 行) -> (画布id, PhotoImage, 重采样方式)
+        self.tile_job = None
+        self.display_size = (0, 0)  # 当前缩放下整图的显示尺寸
+        # 两阶段显示：缩放/滚动时先快速预览，输入停止后再高质量重采样
+        self.preview_resample = Image.NEAREST
+        self.hq_delay_ms = 200  # 输入空闲多久后做高质量重采样
+        self.hq_job = None
+        self.display_resample = Image.LANCZOS  # 当前整图显示使用的重采样方式
+        # 标注图元常驻画布，缩放时只做坐标变换；记录图元当前对应的 (缩放比例, x偏移, y偏移)
+        self.annotation_view = None
+        self.label_text_gap = 2  # 标签文字与框上边的间距（显示像素）
 
         # 标签管理
         try:
@@ -56,6 +1464,9 @@ class ImageAnnotator(ttk.Frame):
                 self.labels = f.read().splitlines()
         except FileNotFoundError:
             self.labels = []
+        self.label_to_id = {}  # 标签名 -> 类别id，与self.labels同步
+        for label_id, label in enumerate(self.labels):
+            self.label_to_id.setdefault(label, label_id)
         if self.labels:
             self.current_label = tk.StringVar(value=self.labels[0])
         else:
@@ -65,6 +1476,41 @@ class ImageAnnotator(ttk.Frame):
         self.save_format = tk.StringVar(value="JSON")
 
         self.setup_ui()
+        self.bind("<Destroy>", self.on_destroy)
+
+    def on_destroy(self, event):
+        """界面销毁时停止预读线程"""
+        if event.widget is self:
+            self.stop_folder_scan()
+            self.prefetcher.stop()
+            if self.review_log is not None:
+                self.review_log.close()
+
+    def suspend(self):
+        """页面隐藏时取消待执行的重采样/图块渲染任务（已加载的文件夹、图片和标注保留，文件夹扫描继续）"""
+        for job in (self.hq_job, self.tile_job, self.scan_job):
+            if job is not None:
+                self.after_cancel(job)
+        self.hq_job = None
+        self.tile_job = None
+        self.scan_job = None
+
+    def resume(self):
+        """页面重新显示时补做高质量显示并恢复相邻图片预读"""
+        if self.folder_scanner is not None and self.scan_job is None:
+            self.poll_folder_scan()
+        if not self.original_image:
+            return
+        self.schedule_high_quality()
+        image_index = self.image_file_index.get(self.image_path)
+        if image_index is not None:
+            self.schedule_prefetch(image_index)
+
+    def release_buffers(self):
+        """释放预读缓存和图块缓存（当前显示的图像和图块保留）"""
+        self.prefetcher.clear()
+        if self.tile_renderer is not None:
+            self.tile_renderer.tiles.clear()
 
     def toggle_state(self):
         self.state = not self.state
@@ -90,6 +1536,7 @@ class ImageAnnotator(ttk.Frame):
         ttk.Button(file_frame, text="打开文件夹", command=self.open_folder).pack(side=tk.LEFT, padx=2)
         ttk.Button(file_frame, text="上一张", command=self.prev_image).pack(side=tk.LEFT, padx=2)
         ttk.Button(file_frame, text="下一张", command=self.next_image).pack(side=tk.LEFT, padx=2)
+        ttk.Button(file_frame, text="批量校验", command=self.validate_folder).pack(side=tk.LEFT, padx=2)
 
         # 标注操作
         annotate_frame = ttk.LabelFrame(control_frame, text="标注操作", padding=5)
@@ -98,6 +1545,7 @@ class ImageAnnotator(ttk.Frame):
         ttk.Button(annotate_frame, text="新建矩形", command=self.start_rect_mode).pack(side=tk.LEFT, padx=2)
         ttk.Button(annotate_frame, text="删除选中", command=self.delete_selected_annotation).pack(side=tk.LEFT, padx=2)
         ttk.Button(annotate_frame, text="清除所有", command=self.clear_annotations).pack(side=tk.LEFT, padx=2)
+        ttk.Button(annotate_frame, text="裁剪越界", command=self.clip_all_annotations).pack(side=tk.LEFT, padx=2)
 
         # 缩放控制
         zoom_frame = ttk.LabelFrame(control_frame, text="缩放控制", padding=5)
@@ -136,8 +1584,8 @@ class ImageAnnotator(ttk.Frame):
         # 画布和滚动条
         # self.canvas = tk.Canvas(canvas_frame, bg="white", cursor="crosshair")
         self.canvas = tk.Canvas(canvas_frame, bg="lightgray", cursor="crosshair")
-        v_scrollbar = ttk.Scrollbar(canvas_frame, orient=tk.VERTICAL, command=self.canvas.yview)
-        h_scrollbar = ttk.Scrollbar(canvas_frame, orient=tk.HORIZONTAL, command=self.canvas.xview)
+        v_scrollbar = ttk.Scrollbar(canvas_frame, orient=tk.VERTICAL, command=self.on_canvas_yview)
+        h_scrollbar = ttk.Scrollbar(canvas_frame, orient=tk.HORIZONTAL, command=self.on_canvas_xview)
 
         self.canvas.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
 
@@ -153,6 +1601,7 @@ class ImageAnnotator(ttk.Frame):
         self.canvas.bind("<Button-4>", self.on_canvas_scroll)
         self.canvas.bind("<Button-5>", self.on_canvas_scroll)
         self.canvas.bind("<Motion>", self.on_canvas_motion)
+        self.canvas.bind("<Configure>", lambda event: self.schedule_tile_render())
         self.canvas.bind("<Enter>", lambda e: self.canvas.focus_set())
         self.canvas.bind("<Left>", lambda event: self.prev_image())
         self.canvas.bind("<Right>", lambda event: self.next_image())
@@ -213,13 +1662,14 @@ class ImageAnnotator(ttk.Frame):
         files_panel = ttk.LabelFrame(content_frame, text="文件列表", padding=5, width=250)
         files_panel.pack(side=tk.RIGHT, fill=tk.Y, padx=(5, 0))
         files_panel.pack_propagate(False)
-        self.files_annotation_listbox = tk.Listbox(files_panel, exportselection=False)
+        self.files_annotation_listbox = VirtualFileList(files_panel)
         v_files_scrollbar = ttk.Scrollbar(files_panel, orient=tk.VERTICAL, command=self.files_annotation_listbox.yview)
         h_files_scrollbar = ttk.Scrollbar(files_panel, orient=tk.HORIZONTAL,
                                           command=self.files_annotation_listbox.xview)
         v_files_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         h_files_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
-        self.files_annotation_listbox.config(yscrollcommand=v_files_scrollbar.set, xscrollcommand=h_files_scrollbar.set)
+        self.files_annotation_listbox.yscrollcommand = v_files_scrollbar.set
+        self.files_annotation_listbox.config(xscrollcommand=h_files_scrollbar.set)
         self.files_annotation_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.files_annotation_listbox.bind("<<ListboxSelect>>", self.files_on_annotation_select)
         # 状态栏
@@ -243,51 +1693,16 @@ class ImageAnnotator(ttk.Frame):
     def files_listbox(self, index=0, judge=True, confirm_judge=False):
         """更新文件列表"""
         if judge:
-            if self.files_annotation_listbox.get(0, tk.END):  # 如果列表不为空
-                self.files_annotation_listbox.delete(0, tk.END)  # 清空列表
-            for image_index, i in enumerate(self.image_files):
-                self.files_annotation_listbox.insert(tk.END, os.path.basename(i))
-                self.files_annotation_listbox.itemconfig(image_index, {'bg': "#FF9999"})
+            # 只更新内存中的行数据，列表控件只绘制可见行
+            self.files_annotation_listbox.set_items([self.file_display_name(path) for path in self.image_files])
         if confirm_judge:
-            confirm_path = os.path.join(os.path.dirname(self.image_path), "confirm_example.txt")
-            confirm_judge_file = True
-            if os.path.exists(confirm_path):
-                files_name_dict = {}
-                with open(confirm_path, 'r', encoding="utf-8") as f:
-                    files_name = f.readlines()
-                    if len(self.image_files) != len(files_name):
-                        confirm_judge_file = False
-                    for line in files_name:
-                        line_split = line.strip().split(" ")
-                        f_name = line_split[0]
-                        file_num = line_split[-1]
-                        if f_name not in self.image_files:
-                            confirm_judge_file = False
-                            continue
-                        else:
-                            if file_num == "1":
-                                try:
-                                    self.files_annotation_listbox.itemconfig(self.image_files.index(f_name),
-                                                                             {'bg': "#99FF99"})
-                                except:
-                                    pass
-                            files_name_dict[f_name] = file_num
-                    f.close()
-                if not confirm_judge_file:
-                    with open(confirm_path, 'w', encoding="utf-8") as f:
-                        for i in self.image_files:
-                            if i in list(files_name_dict.keys()):
-                                f.write(i + f" {files_name_dict[i]}" + '\n')
-                            else:
-                                f.write(i + " 0" + '\n')
-                        f.close()
-                files_name.clear()
-                files_name_dict.clear()
-            else:
-                with open(confirm_path, 'w', encoding="utf-8") as f:
-                    for i in self.image_files:
-                        f.write(i + " 0" + '\n')
-                    f.close()
+            review_log = self.review_state_log(create=True)
+            review_log.sync(self.image_files)  # 首次打开时生成文件，图片增减时对齐
+            states = review_log.states
+            # 行状态数组，0未确认/1已确认
+            self.files_annotation_listbox.status[:] = np.fromiter(
+                (states.get(path) == 1 for path in self.image_files), dtype=np.uint8, count=len(self.image_files))
+            self.files_annotation_listbox.redraw()
         self.files_annotation_listbox.selection_clear(0, tk.END)  # 清除所有选中项
         self.files_annotation_listbox.selection_set(index)  # 选择当前项
         self.files_annotation_listbox.see(index)  # 滚动到选中项
@@ -301,8 +1716,11 @@ class ImageAnnotator(ttk.Frame):
             filetypes=[("Image files", "*.jpg *.jpeg *.png *.bmp *.gif *.tiff")]
         )
         if file_path:
+            self.stop_folder_scan()
+            self.image_folder = None
             self.image_files.clear()
             self.image_files.append(file_path.replace("\\", "/"))
+            self.image_file_index = {self.image_files[0]: 0}
             self.load_image(file_path)
             self.files_listbox()  # 更新文件列表
 
@@ -313,49 +1731,132 @@ class ImageAnnotator(ttk.Frame):
 
         folder_path = filedialog.askdirectory(title="选择图像文件夹")
         if folder_path:
-            self.image_folder = folder_path
-            self.image_files.clear()
-            # 获取所有支持的图像文件
-            self.image_files = [
-                os.path.join(folder_path, f).replace("\\", "/") for f in os.listdir(folder_path)
-                if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff'))
-            ]
-            if self.image_files:
-                self.image_files.sort()  # 按文件名排序
-                self.current_image_index = 0
+            self.stop_folder_scan()
+            self.image_folder = folder_path.replace("\\", "/")
+            # 后台扫描（可包含子文件夹），第一批图片到达就显示，其余边扫描边追加到列表
+            self.image_files = []
+            self.image_file_index = {}
+            self.current_image_index = 0
+            self.files_annotation_listbox.set_items([])
+            self.folder_scanner = FolderScanner(folder_path, self.scan_recursive, self.scan_include,
+                                                self.scan_exclude)
+            self.folder_scanner.start()
+            self.status_var.set("正在扫描文件夹...")
+            self.poll_folder_scan()
+
+    def poll_folder_scan(self):
+        """把后台扫描到的图片追加到文件列表，每50ms执行一次直到扫描结束"""
+        self.scan_job = None
+        scanner = self.folder_scanner
+        if scanner is None:
+            return
+        paths, finished = scanner.poll()
+        if paths:
+            start = len(self.image_files)
+            paths = [path.replace("\\", "/") for path in paths]
+            self.image_files.extend(paths)
+            self.image_file_index.update((path, start + offset) for offset, path in enumerate(paths))
+            self.files_annotation_listbox.append_items([self.file_display_name(path) for path in paths])
+            if start == 0:
                 self.load_image(self.image_files[0])
-                self.files_listbox(confirm_judge=True)
-                self.status_var.set(f"已加载文件夹: {len(self.image_files)} 张图像")
-            else:
-                messagebox.showwarning("警告", "文件夹中没有找到支持的图像文件")
+                self.files_listbox(judge=False)
+        if not finished:
+            self.status_var.set(f"正在扫描文件夹: 已找到 {len(self.image_files)} 张图像")
+            self.scan_job = self.after(50, self.poll_folder_scan)
+            return
+        self.folder_scanner = None
+        if scanner.error is not None:
+            messagebox.showerror("错误", f"扫描文件夹失败: {scanner.error}")
+        if self.image_files:
+            # 扫描按目录读取顺序产出，结束后整体排序一次，再对齐确认状态文件并显示确认状态
+            folder = self.image_folder
+            self.image_files.sort(key=lambda path: scan_sort_key(folder, path))
+            self.image_file_index = {path: index for index, path in enumerate(self.image_files)}
+            self.files_listbox(self.image_file_index.get(self.image_path, 0), judge=True, confirm_judge=True)
+            self.status_var.set(f"已加载文件夹: {len(self.image_files)} 张图像")
+        elif scanner.error is None:
+            messagebox.showwarning("警告", "文件夹中没有找到支持的图像文件")
+
+    def stop_folder_scan(self):
+        """停止正在进行的文件夹扫描（重新打开文件夹或图片时）"""
+        if self.scan_job is not None:
+            self.after_cancel(self.scan_job)
+            self.scan_job = None
+        if self.folder_scanner is not None:
+            self.folder_scanner.cancel()
+            self.folder_scanner = None
+
+    def file_display_name(self, image_path):
+        """文件列表中显示的名称：相对打开文件夹的路径（子文件夹中可能有同名图片）"""
+        if self.image_folder and image_path.startswith(self.image_folder + "/"):
+            return image_path[len(self.image_folder) + 1:]
+        return os.path.basename(image_path)
 
     def load_image(self, image_path):
         """加载图像"""
         try:
             self.image_path = image_path
-            self.original_image = Image.open(image_path)
+            image = Image.open(image_path)
+            self.image_size = image.size
+            # 按适应窗口的显示尺寸缩小解码，放大超过该分辨率时再重新解码
+            canvas_size = (self.canvas.winfo_width(), self.canvas.winfo_height())
+            if canvas_size[0] > 1 and canvas_size[1] > 1:
+                draft_image(image, ImagePrefetcher.fit_size(image.size, canvas_size))
+            self.original_image = image
+            self.decode_scale = image.width / self.image_size[0]
+            self.tile_renderer = None  # 释放上一张图的金字塔和图块
+            # 换图时才清空画布，标注图元在本图显示期间常驻
+            self.canvas.delete("all")
+            self.canvas_items.clear()
+            self.canvas_img = None
+            self.tile_items = {}
+            self.annotation_view = None
+            self.hit_index = AnnotationGridIndex(cell_size=max(64, max(self.image_size) // 64))
+            self.highlighted_annotation = None
             self.current_annotation = None
             self.scale_factor = 1.0
             self.selected_bbox_id = None
-            self.annotations = []
+            self.annotations = AnnotationSet()
             self.modified = False
             # 加载已有的标注文件
             self.load_annotations()
             # 显示图像（适应界面）
             self.display_image_func()
+            image_index = self.image_file_index.get(self.image_path)
+            if image_index is None:
+                image_index = self.image_files.index(self.image_path)
             self.status_var_right.set(
-                f"已加载: {os.path.basename(image_path)}，素材进行{self.image_files.index(self.image_path) + 1} / {len(self.image_files)}")
+                f"已加载: {os.path.basename(image_path)}，素材进行{image_index + 1} / {len(self.image_files)}")
+            self.schedule_prefetch(image_index)
         except Exception as e:
             messagebox.showerror("错误", f"无法加载图像: {str(e)}")
 
-    def display_image_func(self):
-        """在画布上显示图像 - 默认自动适应界面"""
+    def schedule_prefetch(self, index):
+        """预读当前图片前后各prefetch_radius张（近的优先）"""
+        canvas_size = (self.canvas.winfo_width(), self.canvas.winfo_height())
+        if canvas_size[0] <= 1 or canvas_size[1] <= 1:
+            return
+        paths = []
+        for offset in range(1, self.prefetch_radius + 1):
+            for neighbor in (index + offset, index - offset):
+                if 0 <= neighbor < len(self.image_files):
+                    paths.append(self.image_files[neighbor])
+        self.prefetcher.schedule(paths, canvas_size)
+
+    def display_image_func(self, fast=False):
+        """
+        在画布上显示图像 - 默认自动适应界面
+
+        参数:
+            fast: 快速预览（缩放过程中使用），稍后由 refine_display 替换为高质量图像
+        """
         if not self.original_image:
             messagebox.showwarning("警告", "未读取到图片信息")
             return
 
-        # 清除画布
-        self.canvas.delete("all")
+        # 只清除图像，标注图元保留
+        self.canvas.delete("image", "tile")
+        self.tile_items = {}
 
         # 获取画布尺寸
         canvas_width = self.canvas.winfo_width()
@@ -365,45 +1866,165 @@ class ImageAnnotator(ttk.Frame):
             self.after(100, self.display_image_func)
             return
         # 计算缩放后的尺寸（保持原始比例）
-        original_width, original_height = self.original_image.size
+        original_width, original_height = self.image_size
         scale_x = canvas_width / original_width
         scale_y = canvas_height / original_height
-        if self.scale_factor == 1:
+        fitting = self.scale_factor == 1
+        if fitting:
             self.scale_factor = min(scale_x, scale_y) * 0.95  # 留出边距
             # self.scale_factor = min(scale_x, scale_y)  # 留出边距
         new_width = int(original_width * self.scale_factor)  # 缩放后的宽度
         new_height = int(original_height * self.scale_factor)  # 缩放后的高度
+        self.ensure_resolution(new_width, new_height)
         # print(new_width, new_height, self.scale_factor)
-        # 调整图像大小
-        self.display_image = self.original_image.resize((new_width, new_height), Image.LANCZOS)
-
-        # 转换为Tkinter图像
-        self.tk_image = ImageTk.PhotoImage(self.display_image)
-
-        # # 在画布上显示图像（从左上角开始，不居中）
-        # self.canvas.create_image(0, 0, anchor=tk.NW, image=self.tk_image)
-
         # 居中显示图像
         self.image_offset_x = (canvas_width - new_width) // 2
         self.image_offset_y = (canvas_height - new_height) // 2
-        # self.image_offset_x = abs(image_offset_x)
-        # self.image_offset_y = abs(image_offset_y)
-        self.canvas_img = self.canvas.create_image(self.image_offset_x, self.image_offset_y, anchor=tk.NW,
-                                                   image=self.tk_image)
+        self.display_size = (new_width, new_height)
 
         # 更新画布滚动区域以适应图像尺寸
-        # self.canvas.config(scrollregion=(0, 0, new_width, new_height))
-        # self.canvas.config(scrollregion=(0, 0, max(canvas_width, new_width + self.image_offset_x * 2),
-        #                                  max(canvas_height, new_height + self.image_offset_y * 2)
-        #                                  ))
         self.canvas.config(scrollregion=(min(0, self.image_offset_x), min(0, self.image_offset_y),
                                          max(canvas_width, new_width + self.image_offset_x),
                                          max(canvas_height, new_height + self.image_offset_y)
                                          ))
 
-        # 重绘标注
-        self.redraw_annotations()
+        if new_width * new_height > 2 * canvas_width * canvas_height:
+            # 放大后远超画布：分块渲染，只重采样可见区域
+            if self.tile_renderer is None or self.tile_renderer.image is not self.original_image:
+                self.tile_renderer = TiledImageRenderer(self.original_image, self.image_size)
+            self.display_image = None
+            self.tk_image = None
+            self.canvas_img = None
+            self.render_visible_tiles(self.preview_resample if fast else Image.LANCZOS)
+        else:
+            # 适应窗口时优先使用预读缓存，否则调整图像大小
+            canvas_size = (canvas_width, canvas_height)
+            display_image = self.prefetcher.get(self.image_path, canvas_size) if fitting else None
+            self.display_resample = Image.LANCZOS
+            if display_image is None or display_image.size != (new_width, new_height):
+                if fast:
+                    self.display_resample = self.preview_resample
+                display_image = self.original_image.resize((new_width, new_height), self.display_resample)
+                if fitting and not fast:
+                    self.prefetcher.put(self.image_path, canvas_size, display_image)
+            self.display_image = display_image
+
+            # 转换为Tkinter图像
+            self.tk_image = ImageTk.PhotoImage(self.display_image)
+            self.canvas_img = self.canvas.create_image(self.image_offset_x, self.image_offset_y, anchor=tk.NW,
+                                                       image=self.tk_image, tags=("image",))
+            self.canvas.tag_lower(self.canvas_img)  # 图像在标注之下
+
+        # 首次显示时创建标注图元，之后只变换坐标
+        if self.annotation_view is None:
+            self.redraw_annotations()
+        else:
+            self.transform_annotations()
         self.status_var.set(f"显示尺寸: {new_width} x {new_height} (缩放: {int(self.scale_factor * 100)}%)")
+        if fast:
+            self.schedule_high_quality()
+        elif self.hq_job is not None:
+            self.after_cancel(self.hq_job)
+            self.hq_job = None
+
+    def ensure_resolution(self, display_width, display_height):
+        """显示尺寸超过当前解码分辨率时，重新解码到够用的分辨率（仍尽量缩小解码）"""
+        if display_width <= self.original_image.width and display_height <= self.original_image.height:
+            return
+        if self.decode_scale >= 1:
+            return
+        image = draft_image(Image.open(self.image_path), (display_width, display_height))
+        self.original_image.close()
+        self.original_image = image
+        self.decode_scale = image.width / self.image_size[0]
+
+    def schedule_high_quality(self):
+        """输入空闲hq_delay_ms毫秒后做一次高质量重采样，期间的新输入会重新计时"""
+        if self.hq_job is not None:
+            self.after_cancel(self.hq_job)
+        self.hq_job = self.after(self.hq_delay_ms, self.refine_display)
+
+    def refine_display(self):
+        """把快速预览替换为LANCZOS高质量图像（只替换图像，不重绘标注）"""
+        self.hq_job = None
+        if not self.original_image:
+            return
+        if self.canvas_img is not None:
+            if self.display_resample == Image.LANCZOS:
+                return
+            self.display_image = self.original_image.resize(self.display_size, Image.LANCZOS)
+            self.display_resample = Image.LANCZOS
+            self.tk_image = ImageTk.PhotoImage(self.display_image)
+            self.canvas.itemconfig(self.canvas_img, image=self.tk_image)
+        else:
+            self.render_visible_tiles(Image.LANCZOS)
+
+    def render_visible_tiles(self, resample=Image.LANCZOS):
+        """
+        分块模式下渲染与可见区域相交的图块，移除移出视口的图块
+
+        参数:
+            resample: 新图块的重采样方式；为LANCZOS时同时替换可见的预览图块
+        返回:
+            本次新建的预览图块数量
+        """
+        self.tile_job = None
+        if self.tile_renderer is None or self.canvas_img is not None:
+            return 0
+        tile_size = TiledImageRenderer.tile_size
+        display_width, display_height = self.display_size
+        # 可见区域换算到缩放后图像坐标
+        left = self.canvas.canvasx(0) - self.image_offset_x
+        top = self.canvas.canvasy(0) - self.image_offset_y
+        right = left + self.canvas.winfo_width()
+        bottom = top + self.canvas.winfo_height()
+        first_column = max(0, int(left // tile_size))
+        last_column = min((display_width - 1) // tile_size, int(right // tile_size))
+        first_row = max(0, int(top // tile_size))
+        last_row = min((display_height - 1) // tile_size, int(bottom // tile_size))
+
+        visible = set()
+        preview_count = 0
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                key = (self.scale_factor, column, row)
+                visible.add(key)
+                existing = self.tile_items.get(key)
+                if existing is not None and (existing[2] == Image.LANCZOS or resample != Image.LANCZOS):
+                    continue
+                photo = self.tile_renderer.tile(self.scale_factor, column, row, self.display_size, resample)
+                item = self.canvas.create_image(self.image_offset_x + column * tile_size,
+                                                self.image_offset_y + row * tile_size,
+                                                anchor=tk.NW, image=photo, tags=("tile",))
+                if existing is not None:
+                    self.canvas.delete(existing[0])  # 新图块画好后再移除预览图块，避免闪烁
+                self.tile_items[key] = (item, photo, resample)
+                if resample != Image.LANCZOS:
+                    preview_count += 1
+        for key in [key for key in self.tile_items if key not in visible]:
+            self.canvas.delete(self.tile_items.pop(key)[0])
+        # 缓存约为三个视口的图块，内存只与视口大小有关
+        self.tile_renderer.max_tiles = max(64, 3 * len(visible))
+        self.canvas.tag_lower("tile")
+        return preview_count
+
+    def schedule_tile_render(self):
+        """合并同一轮事件中的多次滚动，空闲时先渲染预览图块"""
+        if self.tile_renderer is not None and self.tile_job is None:
+            self.tile_job = self.after_idle(self.render_preview_tiles)
+
+    def render_preview_tiles(self):
+        """滚动时新露出的图块先用快速重采样，空闲后再替换为高质量"""
+        if self.render_visible_tiles(self.preview_resample):
+            self.schedule_high_quality()
+
+    def on_canvas_xview(self, *args):
+        self.canvas.xview(*args)
+        self.schedule_tile_render()
+
+    def on_canvas_yview(self, *args):
+        self.canvas.yview(*args)
+        self.schedule_tile_render()
 
     def zoom_image(self, factor):
         """缩放图像"""
@@ -415,7 +2036,7 @@ class ImageAnnotator(ttk.Frame):
         new_scale = self.scale_factor + factor
         if 0.1 <= new_scale <= 5.0:
             self.scale_factor = new_scale
-            self.display_image_func()
+            self.display_image_func(fast=True)
 
     def fit_to_window(self):
         """适应窗口大小"""
@@ -471,6 +2092,22 @@ class ImageAnnotator(ttk.Frame):
             return "e"
         return None
 
+    def hit_test(self, x, y):
+        """
+        查找画布坐标(x, y)处边线被命中的标注框
+
+        返回:
+            (标注, 标注框显示坐标 [x1, y1, x2, y2])，未命中时为 (None, None)
+        """
+        scale = self.scale_factor
+        annotation = self.hit_index.hit((x - self.image_offset_x) / scale, (y - self.image_offset_y) / scale,
+                                        self.hit_tolerance / scale)
+        if annotation is None:
+            return None, None
+        x1, y1, x2, y2 = annotation["bbox"]
+        return annotation, [x1 * scale + self.image_offset_x, y1 * scale + self.image_offset_y,
+                            x2 * scale + self.image_offset_x, y2 * scale + self.image_offset_y]
+
     def get_resize_cursor(self):
         """获取调整大小光标"""
         if self.resize_mode == "nw":
@@ -504,8 +2141,8 @@ class ImageAnnotator(ttk.Frame):
         # 检查是否在图像范围内
         if not self.original_image:
             return
-        img_width = self.original_image.width * self.scale_factor
-        img_height = self.original_image.height * self.scale_factor
+        img_width = self.image_size[0] * self.scale_factor
+        img_height = self.image_size[1] * self.scale_factor
 
         if img_x < 0 or img_y < 0 or img_x > img_width or img_y > img_height:
             return  # 点击在图像外部
@@ -516,37 +2153,27 @@ class ImageAnnotator(ttk.Frame):
         else:
             # 选择模式：检查是否点击了标注框
             self.selected_bbox_id = None
-            overlapping_items = self.canvas.find_overlapping(x - 3, y - 3, x + 3, y + 3)  # 增加一些误差范围
-            for item in overlapping_items:
-                tags = self.canvas.gettags(item)
-                if "bbox" in tags:
-                    self.selected_bbox_id = item
-                    # bbox_index = int(tags[1]) if len(tags) > 1 else -1
-                    # if 0 <= bbox_index <= len(self.annotations):
-                    for d_index, annotation in enumerate(self.annotations):
-                        if str(annotation["canvas_ids"]) == tags[2]:
-                            self.current_annotation = annotation
-                            self.highlight_annotation(d_index)
-                            break
-                    # 检查是否是调整大小操作
-                    bbox_coords = self.canvas.coords(item)
-                    self.resize_mode = self.get_resize_mode(x, y, bbox_coords)
-                    if self.resize_mode:
-                        # 进入调整大小模式
-                        self.mode = "resize"
-                        self.resizing = True
-                        self.canvas.config(cursor=self.get_resize_cursor())
-                        self.status_var.set(f"模式: 调整标注框大小 ({self.resize_mode})")
-                    else:
-                        # 进入移动模式
-                        self.mode = "move"
-                        self.dragging = True
-                        bbox_coords = self.canvas.coords(item)
-                        self.drag_offset_x = x - bbox_coords[0]
-                        self.drag_offset_y = y - bbox_coords[1]
-                        self.canvas.config(cursor="fleur")
-                        self.status_var.set("模式: 移动标注框")
-                    break
+            annotation, bbox_coords = self.hit_test(x, y)
+            if annotation is not None:
+                self.selected_bbox_id = self.canvas_items.items_of(annotation)[0]
+                self.current_annotation = annotation
+                self.highlight_annotation(self.annotations.index(annotation))
+                # 检查是否是调整大小操作
+                self.resize_mode = self.get_resize_mode(x, y, bbox_coords)
+                if self.resize_mode:
+                    # 进入调整大小模式
+                    self.mode = "resize"
+                    self.resizing = True
+                    self.canvas.config(cursor=self.get_resize_cursor())
+                    self.status_var.set(f"模式: 调整标注框大小 ({self.resize_mode})")
+                else:
+                    # 进入移动模式
+                    self.mode = "move"
+                    self.dragging = True
+                    self.drag_offset_x = x - bbox_coords[0]
+                    self.drag_offset_y = y - bbox_coords[1]
+                    self.canvas.config(cursor="fleur")
+                    self.status_var.set("模式: 移动标注框")
 
     def on_canvas_drag(self, event):
         """处理画布拖动事件"""
@@ -570,10 +2197,8 @@ class ImageAnnotator(ttk.Frame):
             self.canvas.coords(self.selected_bbox_id, new_x1, new_y1, new_x2, new_y2)
 
             # 更新关联的文本标签
-            tags = self.canvas.gettags(self.selected_bbox_id)
-            if len(tags) > 2:
-                text_id = int(eval(tags[2])[1])
-                self.canvas.coords(text_id, new_x1, new_y1 - 10)
+            text_id = self.canvas_items.label_of(self.selected_bbox_id)
+            self.canvas.coords(text_id, new_x1, new_y1 - self.label_text_gap)
         elif self.mode == "resize" and self.resizing and self.selected_bbox_id:
             # 调整标注框大小
             bbox_coords = self.canvas.coords(self.selected_bbox_id)
@@ -603,10 +2228,8 @@ class ImageAnnotator(ttk.Frame):
             self.canvas.coords(self.selected_bbox_id, x1, y1, x2, y2)
 
             # 更新关联的文本位置
-            tags = self.canvas.gettags(self.selected_bbox_id)
-            if len(tags) > 2:
-                text_id = int(eval(tags[2])[1])
-                self.canvas.coords(text_id, x1, y1 - 10)
+            text_id = self.canvas_items.label_of(self.selected_bbox_id)
+            self.canvas.coords(text_id, x1, y1 - self.label_text_gap)
 
     def on_canvas_release(self, event):
         """处理画布释放事件"""
@@ -630,12 +2253,13 @@ class ImageAnnotator(ttk.Frame):
             if self.selected_bbox_id and self.current_annotation:
                 bbox_coords = self.canvas.coords(self.selected_bbox_id)
                 # 转换为原始图像坐标
-                x1 = int((bbox_coords[0] - self.image_offset_x) / self.scale_factor)
-                y1 = int((bbox_coords[1] - self.image_offset_y) / self.scale_factor)
-                x2 = int((bbox_coords[2] - self.image_offset_x) / self.scale_factor)
-                y2 = int((bbox_coords[3] - self.image_offset_y) / self.scale_factor)
+                x1 = round((bbox_coords[0] - self.image_offset_x) / self.scale_factor)
+                y1 = round((bbox_coords[1] - self.image_offset_y) / self.scale_factor)
+                x2 = round((bbox_coords[2] - self.image_offset_x) / self.scale_factor)
+                y2 = round((bbox_coords[3] - self.image_offset_y) / self.scale_factor)
 
                 self.current_annotation["bbox"] = [x1, y1, x2, y2]
+                self.hit_index.update(self.current_annotation)
                 self.update_annotation_list()  # 更新标注列表
                 self.show_annotation_details(self.current_annotation)
                 self.modified = True
@@ -650,12 +2274,13 @@ class ImageAnnotator(ttk.Frame):
             if self.selected_bbox_id and self.current_annotation:
                 bbox_coords = self.canvas.coords(self.selected_bbox_id)
                 # 转换为原始图像坐标
-                x1 = int((bbox_coords[0] - self.image_offset_x) / self.scale_factor)
-                y1 = int((bbox_coords[1] - self.image_offset_y) / self.scale_factor)
-                x2 = int((bbox_coords[2] - self.image_offset_x) / self.scale_factor)
-                y2 = int((bbox_coords[3] - self.image_offset_y) / self.scale_factor)
+                x1 = round((bbox_coords[0] - self.image_offset_x) / self.scale_factor)
+                y1 = round((bbox_coords[1] - self.image_offset_y) / self.scale_factor)
+                x2 = round((bbox_coords[2] - self.image_offset_x) / self.scale_factor)
+                y2 = round((bbox_coords[3] - self.image_offset_y) / self.scale_factor)
 
                 self.current_annotation["bbox"] = [x1, y1, x2, y2]
+                self.hit_index.update(self.current_annotation)
                 self.update_annotation_list()
                 self.show_annotation_details(self.current_annotation)
                 self.highlight_annotation(-1)
@@ -675,34 +2300,23 @@ class ImageAnnotator(ttk.Frame):
             y = self.canvas.canvasy(event.y)  # 获取相对于画布的y坐标
             self.status_var.set(
                 f"界面位置: {x}, {y}，图片当前位置: {int((event.x - self.image_offset_x) / self.scale_factor)}, {int((event.y - self.image_offset_y) / self.scale_factor)}")
-            overlapping_items = self.canvas.find_overlapping(x - 3, y - 3, x + 3, y + 3)  # 找到所有与鼠标位置重叠的项
-
-            for item in overlapping_items:
-                tags = self.canvas.gettags(item)
-                if "bbox" in tags:
-                    on_bbox = True
-                    bbox_coords = self.canvas.coords(item)
-                    self.resize_mode = self.get_resize_mode(x, y, bbox_coords)
-                    # 根据调整模式设置光标形状
-                    if self.resize_mode:
-                        self.canvas.config(cursor=self.get_resize_cursor())
-                    else:
-                        self.canvas.config(cursor="hand2")
-                    break
+            annotation, bbox_coords = self.hit_test(x, y)  # 鼠标下的标注框
+            if annotation is not None:
+                self.resize_mode = self.get_resize_mode(x, y, bbox_coords)
+                # 根据调整模式设置光标形状
+                if self.resize_mode:
+                    self.canvas.config(cursor=self.get_resize_cursor())
                 else:
-                    self.canvas.config(cursor="arrow")
+                    self.canvas.config(cursor="hand2")
+            else:
+                self.canvas.config(cursor="arrow")
 
     def prompt_for_label(self, x1, y1, x2, y2):
         """为新建的标注弹出标签选择对话框"""
         if self.state:
             label = self.current_label.get().strip()
             if label:
-                annotation = {
-                    "label": label,
-                    "bbox": [x1, y1, x2, y2],
-                    "id": len(self.annotations)
-                }
-                self.annotations.append(annotation)  # 添加到标注列表
+                annotation = self.annotations.add(label, [x1, y1, x2, y2])  # 添加到标注列表
                 self.draw_annotation(annotation)  # 绘制标注
                 self.update_annotation_list()  # 更新标注列表
                 self.modified = True
@@ -736,17 +2350,13 @@ class ImageAnnotator(ttk.Frame):
             def on_ok():
                 label_name = label_var.get().strip()
                 if label_name:
-                    annotation_data = {
-                        "label": label_name,
-                        "bbox": [x1, y1, x2, y2],
-                        "id": len(self.annotations)
-                    }
-                    self.annotations.append(annotation_data)  # 添加到标注列表
+                    annotation_data = self.annotations.add(label_name, [x1, y1, x2, y2])  # 添加到标注列表
                     self.draw_annotation(annotation_data)  # 绘制标注
                     self.update_annotation_list()  # 更新标注列表
                     self.modified = True
 
-                    if label_name not in self.labels:
+                    if label_name not in self.label_to_id:
+                        self.label_to_id[label_name] = len(self.labels)
                         self.labels.append(label_name)
                         self.label_combo.config(values=self.labels)
                 if self.rect:
@@ -764,16 +2374,19 @@ class ImageAnnotator(ttk.Frame):
             label_combo.focus_set()
             label_combo.select_range(0, tk.END)
 
-    def draw_annotation(self, annotation):
-        """在画布上绘制标注"""
-        x1, y1, x2, y2 = annotation["bbox"]
+    def draw_annotation(self, annotation, display_box=None):
+        """
+        在画布上绘制标注
 
-        # 转换为显示坐标
-        x1_disp = int(x1 * self.scale_factor) + self.image_offset_x
-        y1_disp = int(y1 * self.scale_factor) + self.image_offset_y
-        x2_disp = int(x2 * self.scale_factor) + self.image_offset_x
-        y2_disp = int(y2 * self.scale_factor) + self.image_offset_y
-        # print(x1_disp, y1_disp, x2_disp, y2_disp, self.scale_factor, self.image_offset_x, self.image_offset_y)
+        参数:
+            display_box: 已换算好的显示坐标（批量重绘时由 AnnotationSet.scaled 一次算出）
+        """
+        if display_box is None:
+            # 转换为显示坐标（保留小数，后续缩放变换不累积取整误差）
+            x1, y1, x2, y2 = annotation["bbox"]
+            display_box = (x1 * self.scale_factor + self.image_offset_x, y1 * self.scale_factor + self.image_offset_y,
+                           x2 * self.scale_factor + self.image_offset_x, y2 * self.scale_factor + self.image_offset_y)
+        x1_disp, y1_disp, x2_disp, y2_disp = display_box
 
         # 绘制矩形框
         rect_id = self.canvas.create_rectangle(
@@ -782,40 +2395,54 @@ class ImageAnnotator(ttk.Frame):
         )
 
         # 绘制标签文本
-        text_id = self.canvas.create_text(x1_disp, y1_disp - 2, text=annotation["label"], fill="red", anchor=tk.SW,
+        text_id = self.canvas.create_text(x1_disp, y1_disp - self.label_text_gap, text=annotation["label"], fill="red", anchor=tk.SW,
                                           font=("Arial", 5, "bold"), tags=("label", str(annotation["id"])))
 
-        annotation["canvas_ids"] = [rect_id, text_id]
-        self.canvas.itemconfig(rect_id, tags=("bbox", str(annotation["id"]), str([rect_id, text_id])))  # 关联矩形框和文本
+        annotation["canvas_ids"] = [rect_id, text_id]  # 保留在JSON中的字段，程序内通过canvas_items查找
+        self.canvas_items.bind(annotation, rect_id, text_id)
+        self.hit_index.insert(annotation)
 
     def redraw_annotations(self):
         """重绘所有标注"""
-        for annotation in self.annotations:
-            self.draw_annotation(annotation)
+        self.canvas.delete("bbox", "label")
+        self.canvas_items.clear()
+        self.hit_index.clear()
+        self.highlighted_annotation = None
+        display_boxes = self.annotations.scaled(self.scale_factor, self.image_offset_x, self.image_offset_y).tolist()
+        for annotation, display_box in zip(self.annotations, display_boxes):
+            self.draw_annotation(annotation, display_box)
+        self.annotation_view = (self.scale_factor, self.image_offset_x, self.image_offset_y)
+
+    def transform_annotations(self):
+        """
+        缩放/平移后更新标注图元坐标：对全部图元做一次缩放和平移（4次画布调用），不重建图元
+        """
+        old_scale, old_offset_x, old_offset_y = self.annotation_view
+        ratio = self.scale_factor / old_scale
+        move_x = self.image_offset_x - old_offset_x
+        move_y = self.image_offset_y - old_offset_y
+        self.canvas.scale("bbox", old_offset_x, old_offset_y, ratio, ratio)
+        self.canvas.move("bbox", move_x, move_y)
+        self.canvas.scale("label", old_offset_x, old_offset_y, ratio, ratio)
+        # 文字与框的间距不随缩放变化，补偿缩放后的间距
+        self.canvas.move("label", move_x, move_y + self.label_text_gap * (ratio - 1))
+        self.annotation_view = (self.scale_factor, self.image_offset_x, self.image_offset_y)
 
     def highlight_annotation(self, index):
         """高亮显示选中的标注"""
         if self.updating_selection:
             return
         self.updating_selection = True
-        # 重置所有标注的颜色
-        for ann in self.annotations:
-            if "canvas_ids" in ann:
-                for canvas_id in ann["canvas_ids"]:
-                    if self.canvas.type(canvas_id) == "rectangle":
-                        self.canvas.itemconfig(canvas_id, outline="red", width=2)
-                    elif self.canvas.type(canvas_id) == "text":
-                        self.canvas.itemconfig(canvas_id, fill="red")
+        annotation = self.annotations[index] if 0 <= index < len(self.annotations) else None
+        # 只重置上一次高亮的标注
+        if self.highlighted_annotation is not None and self.highlighted_annotation is not annotation:
+            self.set_annotation_color(self.highlighted_annotation, "red")
+        self.highlighted_annotation = None
 
         # 高亮选中的标注
-        if index >= 0 and index < len(self.annotations):
-            annotation = self.annotations[index]
-            if "canvas_ids" in annotation:
-                for canvas_id in annotation["canvas_ids"]:
-                    if self.canvas.type(canvas_id) == "rectangle":
-                        self.canvas.itemconfig(canvas_id, outline="blue", width=2)
-                    elif self.canvas.type(canvas_id) == "text":
-                        self.canvas.itemconfig(canvas_id, fill="blue")
+        if annotation is not None:
+            self.set_annotation_color(annotation, "blue")
+            self.highlighted_annotation = annotation
             # 更新标注列表选中状态
             self.annotation_listbox.selection_clear(0, tk.END)  # 清除所有选中项
             self.annotation_listbox.selection_set(index)  # 选择当前项
@@ -823,13 +2450,21 @@ class ImageAnnotator(ttk.Frame):
 
         self.updating_selection = False
 
+    def set_annotation_color(self, annotation, color):
+        """设置标注框和标签文字的颜色"""
+        items = self.canvas_items.items_of(annotation)
+        if items is not None:
+            rect_id, text_id = items
+            self.canvas.itemconfig(rect_id, outline=color)
+            self.canvas.itemconfig(text_id, fill=color)
+
     def update_annotation_list(self):
         """更新标注列表显示"""
         self.annotation_listbox.delete(0, tk.END)
-        for i, annotation in enumerate(self.annotations):
-            label = annotation["label"]
-            x1, y1, x2, y2 = annotation["bbox"]
-            self.annotation_listbox.insert(tk.END, f"{i + 1}: {label} ({x1},{y1},{x2},{y2})")
+        rows = [f"{i + 1}: {label} ({x1},{y1},{x2},{y2})" for i, (label, (x1, y1, x2, y2)) in
+                enumerate(zip(self.annotations.label_names(), self.annotations.boxes.tolist()))]
+        if rows:
+            self.annotation_listbox.insert(tk.END, *rows)  # 一次插入全部行
 
     def on_annotation_select(self, event):
         """处理标注列表选择事件"""
@@ -873,10 +2508,13 @@ class ImageAnnotator(ttk.Frame):
     def delete_selected_annotation(self):
         """删除选中的标注"""
         if self.current_annotation:
-            if "canvas_ids" in self.current_annotation:
-                for canvas_id in self.current_annotation["canvas_ids"]:
-                    self.canvas.delete(canvas_id)
+            items = self.canvas_items.unbind(self.current_annotation)
+            if items is not None:
+                self.canvas.delete(*items)
 
+            self.hit_index.remove(self.current_annotation)
+            if self.highlighted_annotation is self.current_annotation:
+                self.highlighted_annotation = None  # 图元已删除，无需再重置颜色
             if self.current_annotation in self.annotations:
                 self.annotations.remove(self.current_annotation)
                 self.modified = True
@@ -891,12 +2529,11 @@ class ImageAnnotator(ttk.Frame):
     def clear_annotations(self):
         """清除所有标注"""
         if self.annotations and messagebox.askyesno("确认", "确定要清除所有标注吗？"):
-            for annotation in self.annotations:
-                if "canvas_ids" in annotation:
-                    for canvas_id in annotation["canvas_ids"]:
-                        self.canvas.delete(canvas_id)
-
-            self.annotations = []
+            self.canvas.delete("bbox", "label")
+            self.canvas_items.clear()
+            self.annotations = AnnotationSet()
+            self.hit_index.clear()
+            self.highlighted_annotation = None
             self.modified = True
             self.update_annotation_list()
             self.detail_text.delete(1.0, tk.END)
@@ -965,22 +2602,85 @@ class ImageAnnotator(ttk.Frame):
         if not self.original_image or not self.annotations:
             return True
 
-        width, height = self.original_image.size
-
-        for i, annotation in enumerate(self.annotations):
-            x1, y1, x2, y2 = annotation["bbox"]
+        width, height = self.image_size
 
-            if x1 < 0 or y1 < 0 or x2 > width or y2 > height or x1 >= x2 or y1 >= y2:
-                messagebox.showerror(
-                    "错误",
-                    f"标注框 #{i + 1} ({annotation['label']}) 超出图像边界或无效！\n"
-                    f"图像尺寸: {width} × {height}\n"
-                    f"标注框位置: ({x1},{y1})-({x2},{y2})"
-                )
-                return False
+        flags = self.annotations.issue_flags(width, height)
+        invalid = np.flatnonzero(flags)
+        if not len(invalid):
+            return True
 
+        # 一次列出所有问题框，而不是遇到第一个就中断
+        labels = self.annotations.label_names()
+        lines = []
+        for i in invalid[:self.report_max_lines].tolist():
+            x1, y1, x2, y2 = self.annotations.boxes[i].tolist()
+            lines.append(f"#{i + 1} ({labels[i]}) ({x1},{y1})-({x2},{y2}): {describe_box_issues(flags[i])}")
+        if len(invalid) > self.report_max_lines:
+            lines.append(f"…… 其余 {len(invalid) - self.report_max_lines} 个未列出")
+        repair = messagebox.askyesno(
+            "标注框越界",
+            f"{len(invalid)} 个标注框超出图像边界或无效（图像尺寸: {width} × {height}）:\n"
+            + "\n".join(lines)
+            + "\n\n是否将全部标注框裁剪到图像范围内后保存？（裁剪后无面积的框将被删除）"
+        )
+        if not repair:
+            return False
+        self.clip_all_annotations()
         return True
 
+    def clip_all_annotations(self):
+        """一键把所有标注框裁剪到图像范围内"""
+        if not self.original_image or not self.annotations:
+            return
+        changed, dropped = self.annotations.clip_to_image(*self.image_size)
+        if not changed and not dropped:
+            self.status_var.set("所有标注框均在图像范围内")
+            return
+        self.current_annotation = None
+        self.redraw_annotations()
+        self.update_annotation_list()
+        self.detail_text.delete(1.0, tk.END)
+        self.modified = True
+        self.status_var.set(f"已裁剪 {changed} 个标注框，删除 {dropped} 个无效框")
+
+    def validate_folder(self):
+        """按当前保存格式批量校验文件夹下的标注文件，可一键修复（不逐张打开图片）"""
+        initial_dir = self.image_folder or (os.path.dirname(self.image_path) if self.image_path else None)
+        folder_path = filedialog.askdirectory(title="选择要校验的文件夹", initialdir=initial_dir)
+        if not folder_path:
+            return
+        format_type = self.save_format.get()
+        problems, checked = validate_label_folder(folder_path, format_type, recursive=self.scan_recursive,
+                                                  include=self.scan_include, exclude=self.scan_exclude)
+        if not problems:
+            messagebox.showinfo("校验完成", f"已检查 {checked} 个{format_type}标注文件，未发现问题")
+            return
+        lines = []
+        for result in problems[:self.report_max_lines]:
+            name = os.path.relpath(result["path"], folder_path)  # 子文件夹中可能有同名文件
+            if "error" in result:
+                lines.append(f"{name}: 读取失败 {result['error']}")
+            else:
+                lines.append(f"{name}: {len(result['issues'])}/{result['boxes']} 个框有问题")
+        if len(problems) > self.report_max_lines:
+            lines.append(f"…… 其余 {len(problems) - self.report_max_lines} 个文件未列出")
+        repairable = [result for result in problems if "error" not in result]
+        if not repairable:
+            messagebox.showwarning("校验完成", "\n".join(lines))
+            return
+        if not messagebox.askyesno(
+                "校验完成",
+                f"已检查 {checked} 个{format_type}标注文件，{len(problems)} 个有问题:\n" + "\n".join(lines)
+                + f"\n\n是否修复这 {len(repairable)} 个文件？（裁剪到图像范围内，无面积的框将被删除）"):
+            return
+        dropped = 0
+        for result in repairable:
+            dropped += validate_label_file(result["image"], format_type, repair=True)["dropped"]
+        self.status_var.set(f"已修复 {len(repairable)} 个标注文件，删除 {dropped} 个无效框")
+        # 当前图片的标注可能已被修改，重新加载
+        if self.image_path and path_key(self.image_path) in {path_key(result["image"]) for result in repairable}:
+            self.load_image(self.image_path)
+
     def save_annotations_direct(self):
         """直接保存标注"""
         if not self.image_path:
@@ -1005,28 +2705,40 @@ class ImageAnnotator(ttk.Frame):
 
     def save_confirm_annotations_direct(self):
         """确认保存标注"""
-        confirm_path = os.path.join(os.path.dirname(self.image_path), "confirm_example.txt")
-        if os.path.exists(confirm_path):
-            with open(confirm_path, 'r', encoding="utf-8") as file:
-                lines = file.readlines()
-            for i, line in enumerate(lines):
-                if str(self.image_path) in line:
-                    lines[i] = str(self.image_path) + " 1" + '\n'
-                    self.files_annotation_listbox.itemconfig(self.image_files.index(str(self.image_path)),
-                                                             {'bg': "#99FF99"})
-                    break
-            with open(confirm_path, 'w', encoding="utf-8") as file:
-                file.writelines(lines)
-        return
+        scanning = self.folder_scanner is not None  # 扫描结束前状态文件还没有对齐到全部图片
+        review_log = self.review_state_log(create=scanning)
+        image_path = str(self.image_path)
+        if review_log is None or (image_path not in review_log.states and not scanning):
+            return
+        review_log.set(image_path, 1)  # 只追加一行
+        image_index = self.image_file_index.get(image_path)
+        if image_index is not None:
+            self.files_annotation_listbox.set_status(image_index, 1)
+
+    def review_state_log(self, create=False):
+        """
+        当前打开的文件夹（打开单张图片时为图片所在文件夹）的确认状态日志
+
+        参数:
+            create: 文件不存在时是否创建；为False且文件不存在时返回None
+        """
+        # 打开文件夹时状态统一记录在该文件夹下（包含子文件夹中的图片），与推理的断点续跑一致
+        folder = self.image_folder or os.path.dirname(self.image_path)
+        if self.review_log is not None and self.review_log.folder != folder:
+            self.review_log.close()
+            self.review_log = None
+        if self.review_log is None and (create or os.path.exists(os.path.join(folder, ReviewStateLog.file_name))):
+            self.review_log = ReviewStateLog(folder)
+        return self.review_log
 
     def save_annotations(self):
         """保存标注到JSON文件"""
 
         annotation_data = {
             "image_path": self.image_path,
-            "image_size": self.original_image.size,
+            "image_size": self.image_size,
             "scale_factor": self.scale_factor,
-            "annotations": self.annotations
+            "annotations": self.annotations.to_records()
         }
 
         json_path = os.path.splitext(self.image_path)[0] + "_annotations.json"
@@ -1057,7 +2769,7 @@ class ImageAnnotator(ttk.Frame):
                     with open(json_path, "r", encoding="utf-8") as f:
                         annotation_data = json.load(f)
 
-                    self.annotations = annotation_data.get("annotations", [])
+                    self.annotations = AnnotationSet.from_records(annotation_data.get("annotations", []))
                     # if "scale_factor" in annotation_data:
                     #     self.scale_factor = annotation_data["scale_factor"]
                     self.update_annotation_list()  # 更新标注列表
@@ -1065,12 +2777,12 @@ class ImageAnnotator(ttk.Frame):
                 except Exception as e:
                     messagebox.showwarning("警告", f"加载标注文件失败: {str(e)}")
             else:
-                self.annotations = []
+                self.annotations = AnnotationSet()
                 self.update_annotation_list()
                 self.status_var.set("未找到标注文件")
         elif format_type == "VOC":
             xml_file = os.path.splitext(self.image_path)[0] + ".xml"
-            all_objects = []
+            names, boxes = [], []
             if os.path.exists(xml_file):
                 # 解析XML文件
                 tree = ET.parse(xml_file)
@@ -1080,19 +2792,19 @@ class ImageAnnotator(ttk.Frame):
                     0].find('height').text
                 # 提取xml_object元素
                 xml_objects = xml_root.findall('.//object')
-                for o_index, ob in enumerate(xml_objects):
-                    cdata = {"label": ob.find('name').text.strip(),
-                             "bbox": [int(ob.find('bndbox/xmin').text), int(ob.find('bndbox/ymin').text),
-                                      int(ob.find('bndbox/xmax').text), int(ob.find('bndbox/ymax').text)],
-                             "id": o_index}
-                    all_objects.append(cdata)
-
-            self.annotations = all_objects
+                for ob in xml_objects:
+                    names.append(ob.find('name').text.strip())
+                    boxes.append([int(ob.find('bndbox/xmin').text), int(ob.find('bndbox/ymin').text),
+                                  int(ob.find('bndbox/xmax').text), int(ob.find('bndbox/ymax').text)])
+
+            labels = list(dict.fromkeys(names))  # 去重且保持出现顺序
+            label_index = {label: index for index, label in enumerate(labels)}
+            self.annotations = AnnotationSet(boxes, [label_index[name] for name in names], labels)
             self.update_annotation_list()  # 更新标注列表
             self.status_var_right.set(f"已加载标注: {len(self.annotations)} 个")
 
         elif format_type == "YOLO":
-            img_width, img_height = self.original_image.size
+            img_width, img_height = self.image_size
             text_to_path = os.path.join(os.path.dirname(self.image_path), "classes.txt")
             txt_file = os.path.splitext(self.image_path)[0] + ".txt"
             lines = None
@@ -1103,23 +2815,18 @@ class ImageAnnotator(ttk.Frame):
                     lines = file.read().splitlines()
             else:
                 messagebox.showerror("错误", "未找到标签文件")
-            all_objects = []
+            self.annotations = AnnotationSet()
             if os.path.exists(txt_file) and lines:
                 with open(txt_file, 'r', encoding="utf-8") as f:
-                    objects = f.read().splitlines()
-                    for o_index, object in enumerate(objects):
-                        object_info = object.strip().split(' ')
-                        x_center = float(object_info[1]) * img_width
-                        y_center = float(object_info[2]) * img_height
-                        xminVal = int(x_center - 0.5 * float(object_info[3]) * img_width)  # object_info列表中的元素都是字符串类型
-                        yminVal = int(y_center - 0.5 * float(object_info[4]) * img_height)
-                        xmaxVal = int(x_center + 0.5 * float(object_info[3]) * img_width)
-                        ymaxVal = int(y_center + 0.5 * float(object_info[4]) * img_height)
-                        cdata = {"label": lines[int(object_info[0])].strip(),
-                                 "bbox": [xminVal, yminVal, xmaxVal, ymaxVal],
-                                 "id": o_index}
-                        all_objects.append(cdata)
-            self.annotations = all_objects
+                    rows = [line.split()[:5] for line in f.read().splitlines() if line.strip()]
+                if rows:
+                    values = np.array(rows, dtype=np.float64).reshape(-1, 5)
+                    centers = values[:, 1:3] * (img_width, img_height)
+                    half_sizes = 0.5 * values[:, 3:5] * (img_width, img_height)
+                    # 与int()一致，向0取整
+                    boxes = np.trunc(np.hstack((centers - half_sizes, centers + half_sizes)))
+                    self.annotations = AnnotationSet(boxes, values[:, 0].astype(np.int16),
+                                                     [line.strip() for line in lines])
             self.update_annotation_list()  # 更新标注列表
             self.status_var_right.set(f"已加载标注: {len(self.annotations)} 个")
 
@@ -1193,67 +2900,31 @@ class ImageAnnotator(ttk.Frame):
             return
 
         try:
-            annotation = ET.Element("annotation")
-            folder = ET.SubElement(annotation, "folder")
             # 获取文件所在目录的父目录路径
             parent_directory = os.path.dirname(self.image_path)
-            # 从父目录路径中提取最后一个文件夹名
-            folder.text = os.path.basename(parent_directory)
-
-            filename = ET.SubElement(annotation, "filename")
-            filename.text = os.path.basename(self.image_path)
-
-            source = ET.SubElement(annotation, "source")
-            database = ET.SubElement(source, "database")
-            database.text = "Custom software"
-            annotation_source = ET.SubElement(source, "annotation")
-            annotation_source.text = "PASCAL VOC2025"
-            image = ET.SubElement(source, "path")
-            image.text = str(self.image_path)
-
-            owner = ET.SubElement(annotation, "owner")
-            name = ET.SubElement(owner, "name")
-            name.text = "jpj"
-
-            size = ET.SubElement(annotation, "size")
-            width = ET.SubElement(size, "width")
-            width.text = str(self.original_image.width)
-            height = ET.SubElement(size, "height")
-            height.text = str(self.original_image.height)
-            depth = ET.SubElement(size, "depth")
-            depth.text = "3"
-
-            segmented = ET.SubElement(annotation, "segmented")
-            segmented.text = "0"
-
-            for i, ann in enumerate(self.annotations):
-                obj = ET.SubElement(annotation, "object")
-
-                name = ET.SubElement(obj, "name")
-                name.text = ann["label"]
-
-                pose = ET.SubElement(obj, "pose")
-                pose.text = "Unspecified"
-
-                truncated = ET.SubElement(obj, "truncated")
-                truncated.text = "0"
-
-                difficult = ET.SubElement(obj, "difficult")
-                difficult.text = "0"
-
-                bndbox = ET.SubElement(obj, "bndbox")
-                xmin = ET.SubElement(bndbox, "xmin")
-                xmin.text = str(ann["bbox"][0])
-                ymin = ET.SubElement(bndbox, "ymin")
-                ymin.text = str(ann["bbox"][1])
-                xmax = ET.SubElement(bndbox, "xmax")
-                xmax.text = str(ann["bbox"][2])
-                ymax = ET.SubElement(bndbox, "ymax")
-                ymax.text = str(ann["bbox"][3])
-
-            rough_string = ET.tostring(annotation, encoding='utf-8')
-            reparsed = minidom.parseString(rough_string)
-            pretty_xml = reparsed.toprettyxml(indent="  ")
+            children = [
+                # 从父目录路径中提取最后一个文件夹名
+                ("folder", os.path.basename(parent_directory)),
+                ("filename", os.path.basename(self.image_path)),
+                ("source", [("database", "Custom software"),
+                            ("annotation", "PASCAL VOC2025"),
+                            ("path", str(self.image_path))]),
+                ("owner", [("name", "jpj")]),
+                ("size", [("width", str(self.image_size[0])),
+                          ("height", str(self.image_size[1])),
+                          ("depth", "3")]),
+                ("segmented", "0"),
+            ]
+            for label, (x1, y1, x2, y2) in zip(self.annotations.label_names(), self.annotations.boxes.tolist()):
+                children.append(("object", [
+                    ("name", label),
+                    ("pose", "Unspecified"),
+                    ("truncated", "0"),
+                    ("difficult", "0"),
+                    ("bndbox", [("xmin", str(x1)), ("ymin", str(y1)), ("xmax", str(x2)), ("ymax", str(y2))]),
+                ]))
+
+            pretty_xml = render_voc_xml("annotation", children)
             with open(xml_path, "w", encoding="utf-8") as f:
                 f.write(pretty_xml)
 
@@ -1274,27 +2945,17 @@ class ImageAnnotator(ttk.Frame):
 
         try:
             # 获取图像尺寸
-            img_width, img_height = self.original_image.size
-            # 创建类别映射
-            unique_labels = list(set(ann["label"] for ann in self.annotations))
-            label_to_id = {label: self.labels.index(label) for label in unique_labels}
-            # 生成YOLO格式内容
-            yolo_lines = []
-            for ann in self.annotations:
-                x1, y1, x2, y2 = ann["bbox"]
-
-                # 计算归一化坐标 [6](@ref)
-                x_center = (x1 + x2) / 2.0 / img_width
-                y_center = (y1 + y2) / 2.0 / img_height
-                width = (x2 - x1) / img_width
-                height = (y2 - y1) / img_height
-
-                class_id = label_to_id[ann["label"]]
-                yolo_lines.append(f"{class_id} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}")
+            img_width, img_height = self.image_size
+            # 通过标签字典查找类别id
+            class_ids, missing = self.annotations.mapped_class_ids(self.label_to_id)
+            if missing:
+                raise ValueError(f"标签不在标签列表中: {', '.join(sorted(missing))}")
+
+            # 计算归一化坐标 [6](@ref)
+            boxes_xywhn = self.annotations.normalized_xywh(img_width, img_height)
 
             # 写入YOLO格式文件
-            with open(txt_path, "w", encoding="utf-8") as f:
-                f.write("\n".join(yolo_lines))
+            write_yolo_labels(txt_path, class_ids, boxes_xywhn)
 
             # 同时生成数据集配置文件（可选）
             self.generate_yolo_dataset_config()
@@ -1355,6 +3016,13 @@ class HomePage(ttk.Frame):
         self.gif_path = "./welcome_animation.gif"
         self.is_playing = True
         self.playback_speed = 1.0  # 播放速度倍数
+        self.animate_job = None  # 下一帧的after任务，页面隐藏时取消
+        # 按需解码的帧环形缓冲：只保留接下来要播放的几帧，启动时间和内存与GIF长度无关
+        self.buffer_size = 8
+        self.frame_buffer = deque()  # (帧序号, PhotoImage, 延迟毫秒)
+        self.frame_count = 0
+        self.next_decode = 0  # 下一个要解码的帧序号
+        self.current_frame = None  # 正在显示的帧，保持PhotoImage引用
 
         self.setup_ui()
         self.load_gif()
@@ -1387,58 +3055,71 @@ class HomePage(ttk.Frame):
                                                                            padx=5)
 
     def load_gif(self):
-        """加载GIF文件"""
+        """打开GIF文件（只读取文件头，帧在播放时按需解码）"""
         try:
-            # gif_data = base64.b64decode(self.gif_path)
-            # gif_buffer = io.BytesIO(gif_data)
-            # 获取画布尺寸
-            # new_width = self.winfo_width()
-            # new_height = self.winfo_height()
-            # print(new_width, new_height)
             self.gif_image = Image.open(self.gif_path, 'r')
-            # self.gif_image = gif_image.resize((new_width, new_height), Image.LANCZOS)
-            self.frames = []
-            self.delays = []
-
-            # 提取所有帧
-            try:
-                frame_idx = 0
-                while True:
-                    frame = self.gif_image.copy().convert('RGBA')
-                    photo = ImageTk.PhotoImage(frame)
-                    self.frames.append(photo)
-
-                    # 获取延迟时间
-                    delay = self.gif_image.info.get('duration', 100)
-                    self.delays.append(delay)
-
-                    frame_idx += 1
-                    self.gif_image.seek(frame_idx)
-            except EOFError:
-                pass
-            self.current_frame_index = 0
+            self.frame_count = getattr(self.gif_image, "n_frames", 1)
+            self.next_decode = 0
+            self.fill_buffer()
+            self.bind("<Map>", lambda event: self.resume() if event.widget is self else None)
             self.animate()
 
         except Exception as e:
             error_label = tk.Label(self, text=f"加载动画失败: {e}")
             error_label.pack()
 
+    def decode_next_frame(self):
+        """解码下一帧放入缓冲"""
+        index = self.next_decode
+        self.gif_image.seek(index)
+        photo = ImageTk.PhotoImage(self.gif_image.convert('RGBA'))
+        delay = self.gif_image.info.get('duration', 100)
+        self.frame_buffer.append((index, photo, delay))
+        self.next_decode = (index + 1) % self.frame_count
+
+    def fill_buffer(self):
+        """补满缓冲（帧数不超过缓冲大小的短动画全部帧常驻）"""
+        while len(self.frame_buffer) < min(self.buffer_size, self.frame_count):
+            self.decode_next_frame()
+
     def animate(self):
         """动画播放控制"""
-        if not hasattr(self, 'frames') or not self.frames:
-            return
+        self.animate_job = None
+        if not self.frame_count or not self.winfo_ismapped():
+            return  # 页面不可见时停止，重新显示时由resume继续
 
         if self.is_playing:
+            self.fill_buffer()
             # 显示当前帧
-            self.gif_label.configure(image=self.frames[self.current_frame_index])
-            # 更新帧索引
-            self.current_frame_index = (self.current_frame_index + 1) % len(self.frames)
+            self.current_frame = self.frame_buffer.popleft()
+            self.gif_label.configure(image=self.current_frame[1])
+            if self.frame_count <= self.buffer_size:
+                self.frame_buffer.append(self.current_frame)  # 短动画循环使用已解码的帧
+            else:
+                self.decode_next_frame()
 
         # 计算下一帧延迟（考虑播放速度）
-        delay = self.delays[self.current_frame_index] if self.delays else 100
+        delay = self.current_frame[2] if self.current_frame else 100
         adjusted_delay = int(delay / self.playback_speed)
 
-        self.after(adjusted_delay, self.animate)
+        self.animate_job = self.after(adjusted_delay, self.animate)
+
+    def suspend(self):
+        """页面隐藏时停止动画定时器"""
+        if self.animate_job is not None:
+            self.after_cancel(self.animate_job)
+            self.animate_job = None
+
+    def resume(self):
+        """页面重新显示时继续播放"""
+        if self.animate_job is None:
+            self.animate()
+
+    def release_buffers(self):
+        """释放缓冲中未播放的帧，重新显示时从下一帧继续解码"""
+        if self.frame_buffer:
+            self.next_decode = self.frame_buffer[0][0]
+            self.frame_buffer.clear()
 
     def toggle_play(self):
         """切换播放/暂停状态"""
@@ -1467,6 +3148,18 @@ class BasePage(ttk.Frame):
         """基础重置方法，子类可以覆盖"""
         pass
 
+    def suspend(self):
+        """页面被隐藏时调用（停止定时任务），子类可以覆盖"""
+        pass
+
+    def resume(self):
+        """页面重新显示时调用，子类可以覆盖"""
+        pass
+
+    def release_buffers(self):
+        """页面隐藏期间释放可重建的大块缓存，子类可以覆盖"""
+        pass
+
 
 class AboutPage(BasePage):
     def __init__(self, parent, controller):
@@ -1482,6 +3175,7 @@ class PredictPage(BasePage):
     def __init__(self, parent, controller):
         super().__init__(parent, controller)
         self.current_frame_name = ""
+        warm_up_imports(("numpy", "cv2", "ultralytics"))  # 首次进入推理页时预热推理依赖
         # 创建主框架
         main_frame = ttk.Frame(self, padding="20")
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -1503,52 +3197,670 @@ class PredictPage(BasePage):
         # 右侧内容显示区域
         self.content_frame = ttk.LabelFrame(main_frame, text="文件配置详情", padding="15")
         self.content_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+        self.frames = {}  # 已创建的配置页面，切换时保留（进行中的推理不受影响）
         self.show_frame(list(self.current_option.keys())[0])
 
-    def create_frames(self):
-        """创建各个界面容器"""
-        # 存储所有页面的字典
-        self.frames = {}
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()  # 清除所有子组件
-
-        # 创建所有页面
-        for frame_name, frame_class in self.current_option.items():
-            frame = frame_class(self.content_frame)
+    def get_frame(self, frame_name):
+        """获取配置页面，首次访问时才创建"""
+        frame = self.frames.get(frame_name)
+        if frame is None:
+            frame = self.current_option[frame_name](self.content_frame)
             self.frames[frame_name] = frame
-            frame.pack()
+        return frame
 
     def show_frame(self, frame_name):
         """显示指定界面"""
-        self.create_frames()
-        for frame in self.frames.values():
-            frame.pack_forget()  # 隐藏页面
-        self.frames[frame_name].pack(fill=tk.BOTH, expand=True)
-        self.frames[frame_name].update()  # 更新页面内容
+        if frame_name not in self.current_option:
+            frame_name = list(self.current_option.items())[0][0]
+        for name, frame in self.frames.items():
+            if name != frame_name:
+                frame.pack_forget()  # 隐藏页面
+        frame = self.get_frame(frame_name)
+        frame.tkraise()  # 将指定页面置于顶层
+        frame.pack(fill=tk.BOTH, expand=True)
+        self.current_frame_name = frame_name
 
     def on_select(self, event):
         if self.current_frame_name == event.widget.get():
             return
-        self.create_frames()
-        frame_name = event.widget.get()
-        if frame_name not in self.frames:
-            frame_name = list(self.current_option.items())[0][0]
-        for frame in self.frames.values():
-            frame.pack_forget()  # 隐藏页面
         name = str(event.widget.get()).split('处理')[0]
         self.content_frame.config(text=f"{name}配置详情")
-        self.current_frame_name = frame_name
-        self.frames[frame_name].tkraise()  # 将指定页面置于顶层
-        # self.frames[frame_name].lift()  # 将指定页面置于顶层
-        self.frames[frame_name].pack(fill="both", expand=True)
-        self.frames[frame_name].update()  # 更新页面内容
+        self.show_frame(event.widget.get())
+
+
+class PreannotateEngine(object):
+    """
+    与界面无关的批量预标注引擎：保存推理参数，负责推理和写标注文件
+    推理界面（FileProcessingFrame）和命令行 predict 子命令共用，由 InferenceWorker 驱动
+    """
+
+    def __init__(self, model_path, source, conf_threshold=0.5, iou_threshold=0.5, method="VOC", batch_size=16,
+                 decode_workers=None, write_workers=2, process_count=1, resume_enabled=True, recursive=True,
+                 include=(), exclude=()):
+        self.model_path = model_path
+        self.source = source  # 素材文件或文件夹
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.method = method  # 保存格式，"TXT" 或 "VOC"
+        self.batch_size = batch_size  # 每次送入模型的图片数量
+        if decode_workers is None:
+            decode_workers = max(1, min(4, (os.cpu_count() or 1) // 2))
+        self.decode_workers = decode_workers  # 解码线程数
+        self.write_workers = write_workers  # 写标注文件线程数
+        self.process_count = process_count  # 推理进程数，大于1时按进程分片（CPU推理）
+        self.resume_enabled = resume_enabled  # 跳过已完成/已确认的素材
+        # 素材文件夹扫描方式，见 scan_images
+        self.recursive = recursive
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+        self.labels = {}  # 文件夹 -> classes.txt中的类别
+
+    @property
+    def folder(self):
+        """断点续跑清单和确认状态文件所在的文件夹（素材根文件夹）"""
+        return self.source if os.path.isdir(self.source) else os.path.dirname(self.source)
+
+    def scan(self):
+        """
+        素材来源：文件直接返回单元素列表，文件夹返回已开始扫描的 FolderScanner（可边扫描边迭代）
+        """
+        if os.path.isfile(self.source):
+            return [self.source]
+        scanner = FolderScanner(self.source, self.recursive, self.include, self.exclude)
+        scanner.start()
+        return scanner
+
+    def prepare_classes_file(self, class_names, folder):
+        """
+        写入图片所在文件夹的classes.txt（每次运行每个文件夹只检查一次）
+
+        参数:
+            class_names: 模型的类别名称列表
+            folder: 图片所在文件夹
+        """
+        labels = self.labels.get(folder)
+        text_to_path = os.path.join(folder, "classes.txt")
+        if labels is None and os.path.isfile(text_to_path):
+            with open(text_to_path, "r", encoding="utf-8") as f:
+                labels = f.read().splitlines()
+        if labels != class_names:
+            atomic_write_text(text_to_path, "".join(label + "\n" for label in class_names))
+        self.labels[folder] = class_names
+
+    @staticmethod
+    def save_boxes_to_txt(results, txt_path):
+        """
+        直接从boxes对象保存检测结果为TXT文件（更直接的方法）
+        """
+        if results.boxes is not None and len(results.boxes) > 0:
+            # 获取归一化坐标，写入YOLO标准格式
+            boxes_xywhn = results.boxes.xywhn.cpu().numpy()
+            class_ids = results.boxes.cls.cpu().numpy().astype(int)
+            write_yolo_labels(txt_path, class_ids, boxes_xywhn)
+
+    @staticmethod
+    def save_boxes_to_xml(xml_path, img_name, img_path, results, class_names, orig_img_size):
+        """
+        创建PASCAL VOC格式的XML标注文件 [1,6](@ref)
+
+        Args:
+            xml_path: XML文件保存路径
+            img_name: 图像文件名
+            img_path: 图像完整路径
+            results: YOLO预测结果
+            class_names: 类别名称列表
+            orig_img_size: 原始图像尺寸
+        """
+        if results.boxes is not None and hasattr(results, 'boxes'):
+            children = [
+                # 文件夹信息
+                ("folder", os.path.dirname(img_path) or 'images'),
+                ("filename", img_name),
+                ("path", img_path),
+                ("source", [("database", 'Unknown')]),
+                # 图像尺寸信息
+                ("size", [("width", str(orig_img_size[1])),
+                          ("height", str(orig_img_size[0])),
+                          ("depth", str(orig_img_size[2]))]),
+                # 分割信息
+                ("segmented", '0'),
+            ]
+
+            # 处理检测结果 [2,3](@ref)
+            boxes_data = results.boxes.data.cpu().numpy()
+            for row in boxes_data:
+                # 解析边界框数据 [x1, y1, x2, y2, conf, class_id]
+                if len(row) >= 6:
+                    x1, y1, x2, y2, conf, class_id = row[:6]
+                    # 获取类别名称
+                    class_name = class_names[int(class_id)]
+                    # 只保留置信度大于0的检测结果
+                    if conf > 0:
+                        children.append(('object', [
+                            ('name', class_name),
+                            ('pose', 'Unspecified'),
+                            ('truncated', '0'),
+                            ('difficult', '0'),
+                            ('confidence', f'{conf:.4f}'),
+                            ('bndbox', [('xmin', str(int(x1))), ('ymin', str(int(y1))),
+                                        ('xmax', str(int(x2))), ('ymax', str(int(y2)))]),
+                        ]))
+
+            # 直接生成格式化的XML并保存
+            atomic_write_text(xml_path, render_voc_xml('annotation', children, encoding='utf-8'))
+
+    @staticmethod
+    def predict_mode(images, paths, model, conf_threshold=0.25, iou_threshold=0.45):
+        """
+        使用YOLO模型对一批已解码的图片进行预测（在后台线程或子进程中调用，不操作界面）
+
+        参数:
+            images: 已解码的BGR图像数组列表
+            paths: 与images一一对应的图片路径
+            model: 已加载的YOLO模型（见 load_yolo_model）
+            conf_threshold: 置信度阈值
+            iou_threshold: IOU阈值
+        返回:
+            生成器，逐张产出 (图片路径, 检测结果, 原图尺寸)
+        """
+        # 执行预测（不自动保存TXT，我们手动处理）
+        results = model.predict(
+            source=images,
+            conf=conf_threshold,
+            iou=iou_threshold,
+            stream=True,  # 逐张返回结果，不在内存中累积Results
+            verbose=False,
+            save_txt=False,  # 重要：不自动保存TXT，我们手动处理
+            save_conf=False  # 在手动保存时包含置信度
+        )
+        for path, image, result in zip(paths, images, results):
+            result.path = path
+            # 原图数组已不再需要，只保留尺寸，避免写入队列中堆积大数组
+            result.orig_img = None
+            yield path, result, image.shape
+
+    @staticmethod
+    def write_result(original_path, result, orig_img_size, method):
+        """
+        按所选格式保存单张图片的检测结果（在写入线程或子进程中调用）
+
+        参数:
+            original_path: 图片路径
+            result: YOLO预测结果
+            orig_img_size: 原始图像尺寸 (高, 宽, 通道)
+            method: 保存格式，"TXT" 或 "VOC"
+        """
+        filename = os.path.basename(original_path)
+        if method == "TXT":
+            txt_path = label_output_path(original_path, method)
+            PreannotateEngine.save_boxes_to_txt(result, txt_path)
+        elif method == "VOC":
+            xml_path = label_output_path(original_path, method)
+            PreannotateEngine.save_boxes_to_xml(xml_path, filename, original_path, result, result.names,
+                                                  orig_img_size)
+
+
+def physical_cpu_count():
+    """
+    物理核心数（超线程的逻辑核心不计入），用于划分推理进程和每个进程的torch线程数；
+    psutil（ultralytics的依赖）不可用或无法获取时退回逻辑核心数
+    """
+    try:
+        import psutil
+        count = psutil.cpu_count(logical=False)
+    except ImportError:
+        count = None
+    return count or os.cpu_count() or 1
+
+
+def shard_worker_main(shard_id, image_paths, model_path, conf_threshold, iou_threshold, method, batch_size,
+                      num_threads, events, pause_event, cancel_event):
+    """
+    多进程推理的子进程入口：模型只加载一次，处理分到的图片并自行写标注文件
+
+    参数:
+        shard_id: 分片编号
+        image_paths: 本进程负责的图片路径
+        num_threads: 本进程torch使用的线程数
+        events: 进程间事件队列，事件格式与 InferenceWorker 相同，0号分片加载模型后发送
+                ("names", 类别名称列表)，结束时发送 ("shard_done", 分片编号, 错误信息或None)
+        pause_event/cancel_event: 父进程控制的暂停/取消标记
+    """
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+        model = load_yolo_model(model_path)
+        if shard_id == 0:
+            events.put(("names", list(model.names.values())))
+        for start in range(0, len(image_paths), batch_size):
+            while pause_event.is_set() and not cancel_event.is_set():
+                time.sleep(0.1)
+            if cancel_event.is_set():
+                break
+            started = time.perf_counter()
+            images, paths = [], []
+            for path in image_paths[start:start + batch_size]:
+                try:
+                    images.append(decode_image(path))
+                    paths.append(path)
+                except Exception as e:
+                    events.put(("error", path, f"[进程{shard_id}] {e}"))
+            reported = 0
+            predictions = PreannotateEngine.predict_mode(images, paths, model, conf_threshold, iou_threshold)
+            try:
+                for path, result, orig_img_size in predictions:
+                    reported += 1
+                    try:
+                        PreannotateEngine.write_result(path, result, orig_img_size, method)
+                        events.put(("progress", path, time.perf_counter() - started))
+                    except Exception as e:
+                        events.put(("error", path, f"[进程{shard_id}] {e}"))
+                    # 每张图片之后响应暂停/取消，取消后不再推理本批剩余的图片
+                    while pause_event.is_set() and not cancel_event.is_set():
+                        time.sleep(0.1)
+                    if cancel_event.is_set():
+                        break
+            except Exception as e:
+                for path in paths[reported:]:
+                    events.put(("error", path, f"[进程{shard_id}] {e}"))
+            finally:
+                predictions.close()
+        events.put(("shard_done", shard_id, None))
+    except Exception as e:
+        events.put(("shard_done", shard_id, str(e)))
+
+
+class StageCounter(object):
+    """流水线单个阶段的吞吐统计（多线程累加）"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.busy_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, count, seconds):
+        with self.lock:
+            self.count += count
+            self.busy_seconds += seconds
+
+    def rate(self, wall_seconds):
+        """按墙钟时间计算的吞吐（张/秒）"""
+        return self.count / wall_seconds if wall_seconds > 0 else 0.0
+
+
+class InferenceWorker(threading.Thread):
+    """
+    后台推理线程，Tk主线程只负责轮询事件队列并刷新界面
+
+    内部为 解码 → 推理 → 写入 三级流水线，各级之间使用有界队列：
+        解码: decode_workers个线程用 cv2.imdecode(np.fromfile(...)) 读图
+        推理: 本线程按固定batch_size凑批调用模型
+        写入: write_workers个线程保存TXT/VOC标注文件
+
+    素材由输入线程边扫描边筛选（断点续跑时跳过已完成的图片）后放入待处理队列，扫描未结束解码就已开始。
+
+    队列事件:
+        ("status", 文本)
+        ("total", 已发现的待处理数量, 跳过数量, 扫描是否结束)
+        ("progress", 图片路径, 单张延迟秒)
+        ("error", 图片路径, 错误信息)
+        ("done", 是否被取消)
+        ("failed", 错误信息)
+    """
+    active = set()  # 运行中的线程，程序退出时统一取消
+
+    def __init__(self, engine, image_paths):
+        super().__init__(daemon=True)
+        self.engine = engine  # PreannotateEngine，保存推理参数
+        self.image_paths = image_paths  # 图片路径列表或 FolderScanner
+        self.events = queue.Queue()
+        self.pause_event = threading.Event()
+        self.cancel_event = threading.Event()
+        self.counters = {name: StageCounter(name) for name in ("解码", "推理", "写入")}
+        self.start_time = None
+        self.shard_count = 0  # 多进程模式下的子进程数
+        self.manifest = None  # 断点续跑清单
+        self.manifest_params = None
+        self.confirmed = set()  # 已人工确认的图片（path_key）
+        self.class_names = None  # TXT格式时写入各文件夹classes.txt的类别
+        self.pending_queue = queue.Queue()  # 待处理图片路径，解码线程数个None表示输入结束
+        # 有界队列限制在途图片数量，内存占用与素材数量无关
+        self.decoded_queue = queue.Queue(maxsize=engine.batch_size * 2)
+        self.write_queue = queue.Queue(maxsize=engine.batch_size * 2)
+
+    def pause(self):
+        self.pause_event.set()
+
+    def resume(self):
+        self.pause_event.clear()
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.pause_event.clear()
+        if isinstance(self.image_paths, FolderScanner):
+            self.image_paths.cancel()
+
+    def wait_at_boundary(self):
+        """在图片边界处响应暂停/取消，返回False表示需要停止"""
+        while self.pause_event.is_set() and not self.cancel_event.is_set():
+            time.sleep(0.1)
+        return not self.cancel_event.is_set()
+
+    def put_bounded(self, target_queue, item):
+        """向有界队列放入数据，取消时不再阻塞"""
+        while not self.cancel_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def stage_summary(self):
+        """各阶段吞吐和队列占用，用于判断瓶颈"""
+        if self.start_time is None:
+            return ""
+        wall = time.perf_counter() - self.start_time
+        if self.shard_count:
+            total = self.counters["写入"]
+            return f"{self.shard_count} 个推理进程，合计 {total.rate(wall):.1f} 张/秒"
+        decode, infer, write = (self.counters[name] for name in ("解码", "推理", "写入"))
+        return (f"解码 {decode.rate(wall):.1f} 张/秒 → [{self.decoded_queue.qsize()}] → "
+                f"推理 {infer.rate(wall):.1f} 张/秒 → [{self.write_queue.qsize()}] → "
+                f"写入 {write.rate(wall):.1f} 张/秒")
+
+    def feed_loop(self, sentinels):
+        """
+        输入阶段：边扫描边筛选待处理图片，定时报告已发现的数量
+
+        参数:
+            sentinels: 结束时放入的结束标记数量（每个消费线程一个）
+        """
+        pending = skipped = 0
+        last_report = 0.0
+        folders = set()
+        try:
+            for path in self.image_paths:
+                if self.cancel_event.is_set():
+                    break
+                if self.is_finished(path):
+                    skipped += 1
+                    continue
+                folder = os.path.dirname(path)
+                if self.class_names is not None and folder not in folders:
+                    folders.add(folder)
+                    try:
+                        self.engine.prepare_classes_file(self.class_names, folder)
+                    except OSError as e:
+                        self.events.put(("status", f"无法写入 {folder} 的classes.txt: {e}"))
+                pending += 1
+                self.pending_queue.put(path)
+                now = time.perf_counter()
+                if now - last_report >= 0.2:
+                    self.events.put(("total", pending, skipped, False))
+                    last_report = now
+            error = getattr(self.image_paths, "error", None)
+            if error is not None:
+                self.events.put(("status", f"扫描素材文件夹出错: {error}"))
+        finally:
+            self.events.put(("total", pending, skipped, True))
+            for _ in range(sentinels):
+                self.pending_queue.put(None)
+
+    def decode_loop(self):
+        """解码阶段：多个线程并行读图"""
+        counter = self.counters["解码"]
+        try:
+            while self.wait_at_boundary():
+                path = self.pending_queue.get()
+                if path is None:
+                    break
+                started = time.perf_counter()
+                try:
+                    img = decode_image(path)
+                except Exception as e:
+                    self.events.put(("error", path, str(e)))
+                    continue
+                counter.add(1, time.perf_counter() - started)
+                if not self.put_bounded(self.decoded_queue, (path, img, started)):
+                    break
+        finally:
+            self.decoded_queue.put(None)  # 每个解码线程结束时放入一个结束标记
+
+    def write_loop(self):
+        """写入阶段：多个线程并行保存标注文件"""
+        counter = self.counters["写入"]
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+            path, result, orig_img_size, started = item
+            write_started = time.perf_counter()
+            try:
+                self.engine.write_result(path, result, orig_img_size, self.engine.method)
+            except Exception as e:
+                self.events.put(("error", path, str(e)))
+                continue
+            finally:
+                del result
+            now = time.perf_counter()
+            counter.add(1, now - write_started)
+            self.record_done(path)
+            self.events.put(("progress", path, now - started))
+
+    def infer_batch(self, model, batch):
+        """推理阶段：一批已解码图片送入模型，结果交给写入阶段；每张图片之后响应暂停/取消"""
+        counter = self.counters["推理"]
+        started = time.perf_counter()
+        paths = [item[0] for item in batch]
+        images = [item[1] for item in batch]
+        reported = 0
+        predictions = self.engine.predict_mode(images, paths, model, self.engine.conf_threshold,
+                                               self.engine.iou_threshold)
+        try:
+            for path, result, orig_img_size in predictions:
+                if not self.put_bounded(self.write_queue, (path, result, orig_img_size, batch[reported][2])):
+                    break
+                reported += 1
+                if not self.wait_at_boundary():
+                    break  # 取消后不再推理本批剩余的图片
+        except Exception as e:
+            for path in paths[reported:]:
+                self.events.put(("error", path, str(e)))
+        finally:
+            predictions.close()  # 停止流式推理
+        counter.add(reported, time.perf_counter() - started)
+
+    def run(self):
+        InferenceWorker.active.add(self)
+        decoders, writers, feeders = [], [], []
+        finished = None  # 结束事件，写入线程全部退出后再发送，保证进度事件不晚于结束事件
+        try:
+            if self.engine.resume_enabled:
+                self.open_manifest()
+            if self.engine.process_count > 1:
+                # 多进程时父进程不加载模型，类别名称由第一个子进程上报
+                self.events.put(("status", "开始处理文件..."))
+                self.start_time = time.perf_counter()
+                self.run_sharded()
+                finished = ("done", self.cancel_event.is_set())
+                return
+            self.events.put(("status", "正在加载模型..."))
+            model = load_yolo_model(self.engine.model_path)
+            if self.engine.method == "TXT":
+                self.class_names = list(model.names.values())
+            self.events.put(("status", "开始处理文件..."))
+            self.start_time = time.perf_counter()
+            feeders = [threading.Thread(target=self.feed_loop, args=(self.engine.decode_workers,), daemon=True)]
+            decoders = [threading.Thread(target=self.decode_loop, daemon=True)
+                        for _ in range(self.engine.decode_workers)]
+            writers = [threading.Thread(target=self.write_loop, daemon=True)
+                       for _ in range(self.engine.write_workers)]
+            for thread in feeders + decoders + writers:
+                thread.start()
+
+            batch_size = self.engine.batch_size
+            finished_decoders = 0
+            batch = []
+            while finished_decoders < len(decoders):
+                item = self.decoded_queue.get()
+                if item is None:
+                    finished_decoders += 1
+                else:
+                    batch.append(item)
+                # 凑满固定批次再推理，解码全部结束后处理最后不足一批的部分
+                if batch and (len(batch) >= batch_size or finished_decoders == len(decoders)):
+                    if self.wait_at_boundary():
+                        self.infer_batch(model, batch)
+                    batch = []
+            finished = ("done", self.cancel_event.is_set())
+        except Exception as e:
+            self.cancel_event.set()
+            finished = ("failed", str(e))
+        finally:
+            if isinstance(self.image_paths, FolderScanner):
+                self.image_paths.cancel()  # 推理失败时停止扫描
+            # 推理失败时不再消费解码队列，解码线程可能阻塞在放入结束标记上；清空队列直到它们退出
+            for thread in decoders:
+                while thread.is_alive():
+                    try:
+                        self.decoded_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+            for thread in feeders:
+                thread.join()
+            # 已推理完成的结果全部写完后再退出，不留下写了一半的文件
+            for _ in writers:
+                self.write_queue.put(None)
+            for thread in writers:
+                thread.join()
+            if self.manifest is not None:
+                self.manifest.close()
+            InferenceWorker.active.discard(self)
+            self.events.put(finished)
+
+    def open_manifest(self):
+        """断点续跑：打开清单并读取已人工确认的图片，输入阶段据此跳过已完成的素材"""
+        self.events.put(("status", "正在检查已完成的素材..."))
+        folder = self.engine.folder
+        try:
+            self.manifest = PreannotateManifest(folder)
+        except OSError as e:
+            self.events.put(("status", f"无法打开断点续跑清单，将处理全部素材: {e}"))
+            return
+        engine = self.engine
+        self.manifest_params = {"model": file_digest(engine.model_path), "conf": engine.conf_threshold,
+                                "iou": engine.iou_threshold, "format": engine.method}
+        self.confirmed = load_confirmed_paths(folder)
+
+    def is_finished(self, image_path):
+        """图片已人工确认，或清单中的结果已是最新"""
+        if self.manifest is None:
+            return False
+        return path_key(image_path) in self.confirmed or self.manifest.is_up_to_date(image_path, self.manifest_params)
+
+    def record_done(self, image_path):
+        """图片处理完成后写入断点续跑清单"""
+        if self.manifest is None:
+            return
+        try:
+            self.manifest.record(image_path, self.manifest_params)
+        except OSError:
+            pass  # 清单写入失败不影响标注结果
+
+    def run_sharded(self):
+        """多进程模式：等待素材扫描筛选完成后按进程数交错分片，汇总各子进程的进度和错误"""
+        self.feed_loop(1)
+        image_paths = list(iter(self.pending_queue.get, None))
+        if not image_paths:
+            return
+        engine = self.engine
+        shard_count = min(engine.process_count, len(image_paths))
+        # 按物理核心划分线程，超线程下每个进程的线程数不超过其分到的物理核心
+        num_threads = max(1, physical_cpu_count() // shard_count)
+        ctx = multiprocessing.get_context("spawn")
+        mp_events = ctx.Queue()
+        mp_pause = ctx.Event()
+        mp_cancel = ctx.Event()
+        processes = []
+        for shard_id in range(shard_count):
+            process = ctx.Process(target=shard_worker_main, daemon=True,
+                                  args=(shard_id, image_paths[shard_id::shard_count], engine.model_path,
+                                        engine.conf_threshold, engine.iou_threshold, engine.method,
+                                        engine.batch_size, num_threads, mp_events, mp_pause, mp_cancel))
+            process.start()
+            processes.append(process)
+        self.shard_count = shard_count
+        self.events.put(("status", f"已启动 {shard_count} 个推理进程，每个进程 {num_threads} 线程"))
+
+        running = set(range(shard_count))
+        counter = self.counters["写入"]
+        while running:
+            # 同步暂停/取消状态到子进程
+            if self.cancel_event.is_set():
+                mp_cancel.set()
+            if self.pause_event.is_set():
+                mp_pause.set()
+            else:
+                mp_pause.clear()
+            try:
+                event = mp_events.get(timeout=0.1)
+            except queue.Empty:
+                # 子进程异常退出（如被系统杀掉）时不会发送结束事件
+                for shard_id in list(running):
+                    if not processes[shard_id].is_alive() and processes[shard_id].exitcode not in (0, None):
+                        running.discard(shard_id)
+                        self.events.put(("status", f"进程{shard_id}异常退出: {processes[shard_id].exitcode}"))
+                continue
+            if event[0] == "names":
+                self.prepare_shard_classes(event[1], image_paths)
+                continue
+            if event[0] == "shard_done":
+                running.discard(event[1])
+                if event[2]:
+                    self.events.put(("status", f"进程{event[1]}失败: {event[2]}"))
+                continue
+            if event[0] == "progress":
+                counter.add(1, event[2])
+                self.record_done(event[1])
+            self.events.put(event)
+        for process in processes:
+            process.join(1.0)
+
+    def prepare_shard_classes(self, class_names, image_paths):
+        """多进程模式：收到子进程上报的类别名称后，为TXT格式写入各文件夹的classes.txt"""
+        if self.engine.method != "TXT" or self.class_names is not None:
+            return
+        self.class_names = class_names
+        for folder in sorted({os.path.dirname(path) for path in image_paths}):
+            try:
+                self.engine.prepare_classes_file(class_names, folder)
+            except OSError as e:
+                self.events.put(("status", f"无法写入 {folder} 的classes.txt: {e}"))
+
+    @classmethod
+    def shutdown_all(cls, timeout=5.0):
+        """取消所有运行中的推理线程，并等待当前图片写完"""
+        workers = list(cls.active)
+        for worker in workers:
+            worker.cancel()
+        for worker in workers:
+            worker.join(timeout)
 
 
 class FileProcessingFrame(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
         self.create_widgets()
-        self.labels = []
+        self.batch_size = 16  # 每次送入模型的图片数量
+        self.decode_workers = max(1, min(4, (os.cpu_count() or 1) // 2))  # 解码线程数
+        self.write_workers = 2  # 写标注文件线程数
+        self.process_count = 1  # 推理进程数，大于1时按进程分片（CPU推理）
+        self.resume_enabled = True  # 跳过已完成/已确认的素材
+        self.worker = None  # 后台推理线程
+        self.poll_job = None  # 轮询队列的after任务
+        self.bind("<Destroy>", self.on_destroy)
 
     def create_widgets(self):
         def validate_input(new_value):
@@ -1612,11 +3924,35 @@ class FileProcessingFrame(ttk.Frame):
         method_combobox = ttk.Combobox(frame5, textvariable=self.method_var, values=["VOC", "TXT"])
         method_combobox.pack(side=tk.RIGHT, fill=tk.X, expand=True)
         method_combobox.current(0)
+        # 推理进程数
+        frame6 = ttk.Frame(self)
+        frame6.pack(fill=tk.X, pady=5)
+        ttk.Label(frame6, text="推理进程数:", width=15).pack(side=tk.LEFT, padx=5)
+        self.process_var = tk.IntVar(value=1)
+        ttk.Spinbox(frame6, from_=1, to=physical_cpu_count(), textvariable=self.process_var,
+                    state="readonly").pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.resume_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(frame6, text="跳过已完成/已确认素材", variable=self.resume_var).pack(side=tk.LEFT, padx=5)
+        self.recursive_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(frame6, text="包含子文件夹", variable=self.recursive_var).pack(side=tk.LEFT, padx=5)
+        # 素材筛选通配符（按相对路径或文件名匹配，多个用空格分隔）
+        frame7 = ttk.Frame(self)
+        frame7.pack(fill=tk.X, pady=5)
+        ttk.Label(frame7, text="包含:", width=15).pack(side=tk.LEFT, padx=5)
+        self.include_var = tk.StringVar()
+        ttk.Entry(frame7, textvariable=self.include_var).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Label(frame7, text="排除:").pack(side=tk.LEFT, padx=5)
+        self.exclude_var = tk.StringVar()
+        ttk.Entry(frame7, textvariable=self.exclude_var).pack(side=tk.LEFT, fill=tk.X, expand=True)
         # 提交按钮和进度条容器
         btn_frame = ttk.Frame(self)
         btn_frame.pack(fill=tk.X, pady=10)
         self.submit_btn = ttk.Button(btn_frame, text="提交", command=self.start_progress)
-        self.submit_btn.pack(fill=tk.X)
+        self.submit_btn.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.pause_btn = ttk.Button(btn_frame, text="暂停", command=self.toggle_pause, state=tk.DISABLED)
+        self.pause_btn.pack(side=tk.LEFT, padx=5)
+        self.cancel_btn = ttk.Button(btn_frame, text="取消", command=self.cancel_progress, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.LEFT)
 
         canvas_frame_bottom = ttk.LabelFrame(self, text="状态栏", relief=tk.SUNKEN, height=5)
         canvas_frame_bottom.pack(side=tk.BOTTOM, fill=tk.X)
@@ -1633,6 +3969,10 @@ class FileProcessingFrame(ttk.Frame):
         self.status_var_data = tk.StringVar(value="就绪")
         status_bar = ttk.Label(status_frame, textvariable=self.status_var_data, relief=tk.SUNKEN, anchor=tk.W)
         status_bar.pack(fill=tk.X, expand=True)
+        # 流水线各阶段吞吐
+        self.stage_var = tk.StringVar(value="")
+        stage_bar = ttk.Label(status_frame, textvariable=self.stage_var, relief=tk.SUNKEN, anchor=tk.W)
+        stage_bar.pack(fill=tk.X, expand=True)
 
     def select_file(self, var):
         file_path = filedialog.askopenfilename()
@@ -1650,6 +3990,8 @@ class FileProcessingFrame(ttk.Frame):
         self.conf_vcmd_data = self.conf_entry.get()
         self.iou_vcmd_data = self.iou_entry.get()
         self.method_var_data = self.method_var.get()
+        self.process_count = self.process_var.get()
+        self.resume_enabled = self.resume_var.get()
         self.progress["value"] = 0
         self.progress_label.config(text="0%")
         if self.file1_var_data and self.file2_var_data and self.conf_vcmd_data and self.iou_vcmd_data:
@@ -1657,227 +3999,148 @@ class FileProcessingFrame(ttk.Frame):
             if not os.path.exists(self.file2_var_data):
                 messagebox.showwarning("警告", "素材文件夹不存在！")
                 return  # 目标文件夹不存在，直接返回
-            if os.path.isfile(self.file2_var_data):
-                self.image_paths = [self.file2_var_data]  # 如果是文件，则将其作为单个图像路径
-            else:
-                extensions = ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
-                self.image_paths = sorted(
-                    [os.path.join(self.file2_var_data, str(ext)) for ext in os.listdir(self.file2_var_data) if
-                     str(os.path.splitext(ext)[1]).lower() in extensions])  # 素材列表
-            # 模拟文件处理过程
-            self.progress['maximum'] = len(self.image_paths)  # 设置最大值
+            # 素材数量在扫描过程中逐步增加，由后台线程的total事件更新
+            self.progress['maximum'] = 1
+            self.total_count = 0
+            self.skipped_count = 0
+            self.scan_complete = False
             self.submit_btn.config(state=tk.DISABLED)  # 禁用提交按钮
+            self.pause_btn.config(state=tk.NORMAL, text="暂停")
+            self.cancel_btn.config(state=tk.NORMAL)
+            self.processed_count = 0
+            self.failed_items = []
+            self.total_seconds = 0.0
+            # 推理放到后台线程，界面通过轮询队列刷新；文件夹边扫描边处理
+            engine = PreannotateEngine(str(self.file1_var_data), self.file2_var_data, float(self.conf_vcmd_data),
+                                       float(self.iou_vcmd_data), self.method_var_data, self.batch_size,
+                                       self.decode_workers, self.write_workers, self.process_count,
+                                       self.resume_enabled, self.recursive_var.get(),
+                                       self.include_var.get().split(), self.exclude_var.get().split())
+            self.worker = InferenceWorker(engine, engine.scan())
+            self.worker.start()
             self.update_progress()
         else:
             messagebox.showwarning("警告", "请填写所有必填项！")
             self.status_var_data.set("就绪")
             return
 
-    def save_boxes_to_txt(self, results, txt_path):
-        """
-        直接从boxes对象保存检测结果为TXT文件（更直接的方法）
-        """
-        if results.boxes is not None and len(results.boxes) > 0:
-            with open(txt_path, 'w') as f:
-                # 获取归一化坐标
-                boxes_xywhn = results.boxes.xywhn.cpu().numpy()
-                class_ids = results.boxes.cls.cpu().numpy().astype(int)
-                for i in range(len(results.boxes)):
-                    class_id = class_ids[i]
-                    x_center, y_center, width, height = boxes_xywhn[i]
-                    # 写入YOLO标准格式
-                    f.write(f"{class_id} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}\n")
-
-    def save_boxes_to_xml(self, xml_path, img_name, img_path, results, class_names, orig_img_size):
-        """
-        创建PASCAL VOC格式的XML标注文件 [1,6](@ref)
-
-        Args:
-            xml_path: XML文件保存路径
-            img_name: 图像文件名
-            img_path: 图像完整路径
-            results: YOLO预测结果
-            class_names: 类别名称列表
-            orig_img_size: 原始图像尺寸
-        """
-
-        def prettify_xml(elem):
-            """
-            美化XML输出格式
-            Args:
-                elem: XML元素
-            Returns:
-                格式化后的XML字符串
-            """
-            rough_string = ET.tostring(elem, 'utf-8')
-            reparsed = minidom.parseString(rough_string)
-            return reparsed.toprettyxml(indent="  ", encoding="utf-8").decode('utf-8')
-
-        if results.boxes is not None and hasattr(results, 'boxes'):
-            # 创建根节点
-            annotation = ET.Element('annotation')
-
-            # 添加文件夹信息
-            folder = ET.SubElement(annotation, 'folder')
-            folder.text = os.path.dirname(img_path) or 'images'
-
-            # 添加文件名
-            filename = ET.SubElement(annotation, 'filename')
-            filename.text = img_name
-
-            # 添加路径
-            path = ET.SubElement(annotation, 'path')
-            path.text = img_path
-
-            # 添加源信息
-            source = ET.SubElement(annotation, 'source')
-            database = ET.SubElement(source, 'database')
-            database.text = 'Unknown'
-
-            # 添加图像尺寸信息
-            size = ET.SubElement(annotation, 'size')
-            width_elem = ET.SubElement(size, 'width')
-            width_elem.text = str(orig_img_size[1])
-            height_elem = ET.SubElement(size, 'height')
-            height_elem.text = str(orig_img_size[0])
-            depth_elem = ET.SubElement(size, 'depth')
-            depth_elem.text = str(orig_img_size[2])  # 假设为RGB图像
-            # 添加分割信息
-            segmented = ET.SubElement(annotation, 'segmented')
-            segmented.text = '0'
-
-            # 处理检测结果 [2,3](@ref)
-            boxes_data = results.boxes.data.cpu().numpy()
-            for i in range(len(boxes_data)):
-                # 解析边界框数据 [x1, y1, x2, y2, conf, class_id]
-                if len(boxes_data[i]) >= 6:
-                    x1, y1, x2, y2, conf, class_id = boxes_data[i][:6]
-                    # 转换为整数
-                    x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-                    class_id = int(class_id)
-                    # 获取类别名称
-                    class_name = class_names[class_id]
-                    # 只保留置信度大于0的检测结果
-                    if conf > 0:
-                        # 创建对象标注
-                        obj = ET.SubElement(annotation, 'object')
-                        # 添加类别信息
-                        name = ET.SubElement(obj, 'name')
-                        name.text = class_name
-                        # 添加姿态信息
-                        pose = ET.SubElement(obj, 'pose')
-                        pose.text = 'Unspecified'
-                        # 添加截断信息
-                        truncated = ET.SubElement(obj, 'truncated')
-                        truncated.text = '0'
-                        # 添加难度信息
-                        difficult = ET.SubElement(obj, 'difficult')
-                        difficult.text = '0'
-                        # 添加置信度
-                        confidence = ET.SubElement(obj, 'confidence')
-                        confidence.text = f'{conf:.4f}'
-                        # 添加边界框
-                        bndbox = ET.SubElement(obj, 'bndbox')
-                        xmin = ET.SubElement(bndbox, 'xmin')
-                        xmin.text = str(x1)
-                        ymin = ET.SubElement(bndbox, 'ymin')
-                        ymin.text = str(y1)
-                        xmax = ET.SubElement(bndbox, 'xmax')
-                        xmax.text = str(x2)
-                        ymax = ET.SubElement(bndbox, 'ymax')
-                        ymax.text = str(y2)
-
-            # 美化XML格式并保存
-            xml_str = prettify_xml(annotation)
-            with open(xml_path, 'w', encoding='utf-8') as f:
-                f.write(xml_str)
-
-    def predict_mode(self, source_path, model_path, conf_threshold=0.25, iou_threshold=0.45):
+    def update_progress(self):
         """
-        使用YOLO模型进行预测，并手动保存TXT格式的检测结果
-
-        参数:
-            source_path: 输入源路径（可以是图片、视频、目录等）
-            model_path: YOLO模型路径
-            conf_threshold: 置信度阈值
-            iou_threshold: IOU阈值
+        更新进度条：轮询后台线程的事件队列，每100ms执行一次
         """
-        # 加载YOLO模型
-        model = YOLO(model_path)
-        if self.method_var_data == "TXT":
-            class_id_name = list(model.names.values())
-            if os.path.isdir(source_path):
-                text_to_path = os.path.join(source_path, "classes.txt")
-            else:
-                text_to_path = os.path.join(os.path.dirname(source_path), "classes.txt")
-            if os.path.isfile(text_to_path) and not self.labels:
-                with (open(text_to_path, "r", encoding="utf-8") as f):
-                    self.labels = f.read().splitlines()
-            if self.labels != class_id_name:
-                with (open(text_to_path, "w", encoding="utf-8") as f):
-                    for label in class_id_name:
-                        f.write(label + "\n")
-        # 执行预测（不自动保存TXT，我们手动处理）
-        results = model.predict(
-            source=source_path,
-            conf=conf_threshold,
-            iou=iou_threshold,
-            save_txt=False,  # 重要：不自动保存TXT，我们手动处理
-            save_conf=False  # 在手动保存时包含置信度
-        )
+        self.poll_job = None
+        if self.worker is None:
+            return
+        finished = None
         try:
-            # 处理每个检测结果
-            for i, result in enumerate(results):
-                original_path = result.path
-                filename = os.path.basename(original_path)
-                img_name_without_ext = os.path.splitext(filename)[0]
-                labels_dir = os.path.dirname(original_path)
-                # 获取图像尺寸
-                if hasattr(result, 'orig_img'):
-                    orig_img_size = result.orig_img.shape
+            for _ in range(500):  # 每次最多处理500个事件，避免阻塞界面
+                event = self.worker.events.get_nowait()
+                kind = event[0]
+                if kind == "status":
+                    self.status_var_data.set(event[1])
+                elif kind == "total":
+                    # 边扫描边处理：只统计需要处理的素材（断点续跑时不含跳过的）
+                    self.total_count, self.skipped_count, self.scan_complete = event[1:4]
+                    if not self.processed_count:
+                        scanning = "" if self.scan_complete else "，正在扫描"
+                        self.status_var_data.set(f"跳过 {event[2]} 张已完成素材，待处理 {event[1]} 张{scanning}")
+                elif kind in ("progress", "error"):
+                    self.processed_count += 1
+                    if kind == "progress":
+                        self.total_seconds += event[2]
+                    else:
+                        self.failed_items.append((event[1], event[2]))
                 else:
-                    # 如果无法直接从结果获取，则读取图像
-                    img = cv2.imdecode(np.fromfile(original_path, dtype=np.uint8), cv2.IMREAD_COLOR)
-                    orig_img_size = img.shape
-                # 构建TXT文件路径
-
-                if self.method_var_data == "TXT":
-                    txt_path = os.path.join(labels_dir, f"{img_name_without_ext}.txt")
-                    # 获取检测结果的DataFrame格式
-                    self.save_boxes_to_txt(result, txt_path)
-                elif self.method_var_data == "VOC":
-                    xml_path = os.path.join(labels_dir, f"{img_name_without_ext}.xml")
-                    # 获取检测结果的DataFrame格式
-                    self.save_boxes_to_xml(xml_path, filename, original_path, result, result.names, orig_img_size)
-                self.progress["value"] += 1
-                self.progress_label.config(text=f"{int((self.progress['value'] / self.progress['maximum']) * 100)}%")
-                self.update()
-            return results
-        except Exception as e:
-            messagebox.showerror("错误", f"处理模型时发生错误: {e}")
-            return None
-
-    def update_progress(self):
-        """
-        更新进度条
-        """
-        if self.image_paths:
-            for i_path in self.image_paths:
-                predict_result = self.predict_mode(i_path, model_path=str(self.file1_var_data),
-                                                   conf_threshold=float(self.conf_vcmd_data),
-                                                   iou_threshold=float(self.iou_vcmd_data))
-                if not predict_result:
-                    self.status_var_data.set("处理失败")
+                    finished = event
                     break
+        except queue.Empty:
+            pass
+
+        self.stage_var.set(self.worker.stage_summary())
+        self.progress["maximum"] = max(1, self.total_count, self.processed_count)
+        if self.processed_count:
+            self.progress["value"] = self.processed_count
+            self.progress_label.config(text=f"{int((self.progress['value'] / self.progress['maximum']) * 100)}%")
+            if finished is None:
+                done_count = self.processed_count - len(self.failed_items)
+                avg = self.total_seconds / done_count if done_count else 0.0
+                state = "已暂停" if self.worker.pause_event.is_set() else "处理中"
+                total = f"{self.total_count}" if self.scan_complete else f"{self.total_count}+（扫描中）"
+                self.status_var_data.set(f"{state}: {self.processed_count}/{total}，"
+                                         f"平均延迟 {avg:.3f} 秒/张，失败 {len(self.failed_items)} 张")
+
+        if finished is None:
+            self.poll_job = self.after(100, self.update_progress)
+            return
+
+        if finished[0] == "failed":
+            self.status_var_data.set("处理失败")
+            messagebox.showerror("错误", f"处理模型时发生错误: {finished[1]}")
+        elif finished[1]:
+            self.status_var_data.set(f"已取消: 完成 {self.processed_count}/{self.total_count}")
+        elif not self.total_count:
+            if self.skipped_count:
+                self.status_var_data.set(f"跳过 {self.skipped_count} 张已完成素材，没有需要处理的素材")
+            else:
+                self.status_var_data.set("选择文件没有素材")
+        elif self.failed_items:
+            self.status_var_data.set(f"处理完成，失败 {len(self.failed_items)} 张")
+            first_path, first_error = self.failed_items[0]
+            messagebox.showwarning("警告", f"{len(self.failed_items)} 张图片处理失败，"
+                                           f"例如 {os.path.basename(first_path)}: {first_error}")
+        else:
             self.status_var_data.set("处理完成")
+        self.worker = None
+        self.submit_btn.config(state=tk.NORMAL)  # 处理完成后启用提交按钮
+        self.pause_btn.config(state=tk.DISABLED, text="暂停")
+        self.cancel_btn.config(state=tk.DISABLED)
+
+    def toggle_pause(self):
+        """暂停/继续推理（在当前图片处理完后生效）"""
+        if self.worker is None:
+            return
+        if self.worker.pause_event.is_set():
+            self.worker.resume()
+            self.pause_btn.config(text="暂停")
         else:
-            self.status_var_data.set("选择文件没有素材")
-        self.submit_btn.config(state=tk.NORMAL)  # 处理完成后启用提交按钮)
+            self.worker.pause()
+            self.pause_btn.config(text="继续")
+            self.status_var_data.set("正在暂停，等待当前图片处理完成...")
+
+    def cancel_progress(self):
+        """取消推理（在当前图片处理完后停止）"""
+        if self.worker is not None:
+            self.worker.cancel()
+            self.pause_btn.config(state=tk.DISABLED)
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.status_var_data.set("正在取消，等待当前图片处理完成...")
+
+    def on_destroy(self, event):
+        """界面销毁时停止轮询并取消后台推理"""
+        if event.widget is not self:
+            return
+        if self.poll_job is not None:
+            self.after_cancel(self.poll_job)
+            self.poll_job = None
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
 
 
 class Application(object):
-    def __init__(self, root):
-        self.frames = None
+    def __init__(self, root, release_hidden_buffers=True, release_delay_ms=5 * 60 * 1000):
+        """
+        参数:
+            root: 主窗口
+            release_hidden_buffers: 是否释放隐藏页面的可重建缓存（预读图片、图块等）
+            release_delay_ms: 页面隐藏多久后释放缓存（毫秒）。这是按时间的近似策略，
+                              用来代替按系统内存压力触发的释放：Tk拿不到内存压力通知，
+                              在页面之间来回切换时缓存保留，长时间不回来再释放
+        """
+        self.frames = {}  # 已创建的页面，首次访问时创建并一直保留
+        self.release_hidden_buffers = release_hidden_buffers
+        self.release_delay_ms = release_delay_ms
+        self.release_jobs = {}  # 页面名称 -> 待执行的释放任务
         self.root = root
         self.root.title("多功能工具箱")
         self.root.geometry("1400x900")
@@ -1922,17 +4185,13 @@ class Application(object):
         self.help_menu.add_command(label="关于", command=lambda: self.show_frame("AboutPage"))
         self.help_menu.add_command(label="帮助文档", command=self.show_help)
 
-    def create_frames(self):
-        """创建各个界面容器"""
-        # 存储所有页面的字典
-        self.frames = {}
-        for widget in self.container.winfo_children():
-            widget.destroy()  # 清除所有子组件
-
-        for frame_name, frame_class in self.frame_classes.items():
-            frame = frame_class[0](parent=self.container, controller=self)
+    def get_frame(self, frame_name):
+        """获取页面，首次访问时才创建"""
+        frame = self.frames.get(frame_name)
+        if frame is None:
+            frame = self.frame_classes[frame_name][0](parent=self.container, controller=self)
             self.frames[frame_name] = frame
-            frame.pack()
+        return frame
 
     def switch_title(self, new_title):
         """切换窗口标题并更新内容区域"""
@@ -1941,28 +4200,42 @@ class Application(object):
 
     def show_frame(self, frame_name):
         # 避免重复切换同一界面
+        if frame_name not in self.frame_classes:
+            frame_name = list(self.frame_classes.items())[0][0]
         if self.current_frame_name == frame_name:
             return
-        self.create_frames()
-        if frame_name not in self.frames:
-            frame_name = list(self.frame_classes.items())[0][0]
 
         if self.frame_classes.get(frame_name)[1]:
             self.switch_title(self.frame_classes.get(frame_name)[1])
         else:
             self.switch_title("多功能工具箱")
-        # 隐藏所有页面
-        for frame in self.frames.values():
-            frame.pack_forget()  # 隐藏页面
-
-        # 显示指定页面
-        self.frames[frame_name].tkraise()  # 将指定页面置于顶层
-        # self.frames[frame_name].lift()  # 将指定页面置于顶层
-        self.frames[frame_name].pack(fill="both", expand=True)
-        self.frames[frame_name].update()  # 更新页面内容
+        # 隐藏当前页面（保留页面状态，只停止定时任务）
+        previous = self.frames.get(self.current_frame_name)
+        if previous is not None:
+            previous.suspend()
+            if self.release_hidden_buffers:
+                previous_name = self.current_frame_name
+                self.release_jobs[previous_name] = self.root.after(
+                    self.release_delay_ms, lambda: self.release_hidden_frame(previous_name))
+            previous.pack_forget()
+
+        # 显示指定页面（在释放缓存之前回到该页面时缓存保留）
+        job = self.release_jobs.pop(frame_name, None)
+        if job is not None:
+            self.root.after_cancel(job)
+        frame = self.get_frame(frame_name)
+        frame.tkraise()  # 将指定页面置于顶层
+        frame.pack(fill="both", expand=True)
+        frame.resume()
         # 更新当前界面名称
         self.current_frame_name = frame_name
 
+    def release_hidden_frame(self, frame_name):
+        """页面隐藏一段时间后释放其缓存"""
+        self.release_jobs.pop(frame_name, None)
+        if frame_name != self.current_frame_name:
+            self.frames[frame_name].release_buffers()
+
     def toggle_fullscreen(self):
         """切换全屏模式"""
         self.is_fullscreen = not self.is_fullscreen
@@ -1988,12 +4261,105 @@ class Application(object):
         messagebox.showinfo("帮助", help_text)
 
 
-def main():
+def predict_cli(argv):
+    """
+    命令行批量预标注（不创建界面，可在无显示器的服务器或定时任务中运行）
+
+    用法:
+        python 预标注桌面工具.py predict --model best.pt --source 素材文件夹 [--format TXT] [--batch 16] ...
+    进度和错误输出到stderr，结束时向stdout输出一行JSON统计（张/秒、单张延迟p50/p95等）。
+    返回:
+        进程退出码：全部成功为0，有图片失败、推理失败或未处理完为1
+    """
+    parser = argparse.ArgumentParser(prog="预标注桌面工具.py predict", description="批量预标注")
+    parser.add_argument("--model", required=True, help="YOLO模型文件")
+    parser.add_argument("--source", required=True, help="素材图片或文件夹")
+    parser.add_argument("--conf", type=float, default=0.5, help="置信度阈值")
+    parser.add_argument("--iou", type=float, default=0.5, help="IOU阈值")
+    parser.add_argument("--format", choices=("VOC", "TXT"), default="VOC", help="标注保存格式")
+    parser.add_argument("--batch", type=int, default=16, help="每次送入模型的图片数量")
+    parser.add_argument("--workers", type=int, default=None, help="解码线程数，默认按CPU核数")
+    parser.add_argument("--write-workers", type=int, default=2, help="写标注文件线程数")
+    parser.add_argument("--processes", type=int, default=1, help="推理进程数，大于1时按进程分片（CPU推理）")
+    parser.add_argument("--no-resume", action="store_true", help="不跳过已完成/已确认的素材")
+    parser.add_argument("--no-recursive", action="store_true", help="不扫描子文件夹")
+    parser.add_argument("--include", nargs="+", default=(), help="只处理相对路径或文件名匹配的图片（通配符）")
+    parser.add_argument("--exclude", nargs="+", default=(), help="跳过相对路径或文件名匹配的图片和子文件夹（通配符）")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.source):
+        parser.error(f"素材不存在: {args.source}")
+
+    engine = PreannotateEngine(args.model, args.source, args.conf, args.iou, args.format, max(1, args.batch),
+                               args.workers, max(1, args.write_workers), max(1, args.processes),
+                               not args.no_resume, not args.no_recursive, args.include, args.exclude)
+    worker = InferenceWorker(engine, engine.scan())
+    stats = {"total": 0, "skipped": 0, "done": 0, "failed": 0}
+    latencies = []
+    finished = None
+    worker.start()
+    while finished is None:
+        try:
+            event = worker.events.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        except KeyboardInterrupt:
+            # 第一次Ctrl+C在图片边界处停止，已推理的结果写完后退出
+            worker.cancel()
+            print("正在取消，等待当前图片处理完成...", file=sys.stderr)
+            continue
+        kind = event[0]
+        if kind == "status":
+            print(event[1], file=sys.stderr)
+        elif kind == "total":
+            stats["total"], stats["skipped"] = event[1], event[2]
+        elif kind == "progress":
+            stats["done"] += 1
+            latencies.append(event[2])
+        elif kind == "error":
+            stats["failed"] += 1
+            print(f"失败 {event[1]}: {event[2]}", file=sys.stderr)
+        else:
+            finished = event
+    worker.join()
+
+    wall = time.perf_counter() - worker.start_time if worker.start_time is not None else 0.0
+    latencies.sort()
+    stats.update({
+        "cancelled": finished[0] == "done" and finished[1],
+        "error": finished[1] if finished[0] == "failed" else None,
+        "seconds": round(wall, 3),
+        "images_per_second": round(stats["done"] / wall, 2) if wall > 0 else 0.0,
+        "latency_p50": round(latencies[int(0.50 * (len(latencies) - 1))], 4) if latencies else None,
+        "latency_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 4) if latencies else None,
+        "stages": {name: round(counter.rate(wall), 2) for name, counter in worker.counters.items()},
+    })
+    print(json.dumps(stats, ensure_ascii=False))
+    # 子进程异常退出时不会逐张报告错误，按未处理完判定失败
+    incomplete = not stats["cancelled"] and stats["done"] + stats["failed"] < stats["total"]
+    return 1 if stats["error"] or stats["failed"] or incomplete else 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "predict":
+        return predict_cli(argv[1:])
+    parser = argparse.ArgumentParser(prog="预标注桌面工具.py", description="多功能工具箱（不带子命令时启动界面）")
+    parser.add_argument("--release-delay", type=float, default=300.0,
+                        help="页面隐藏多少秒后释放其缓存（预读图片、图块等），默认300")
+    parser.add_argument("--keep-hidden-buffers", action="store_true", help="不释放隐藏页面的缓存（内存充足时）")
+    args = parser.parse_args(argv)
     root = tk.Tk()
-    Application(root)
+    Application(root, release_hidden_buffers=not args.keep_hidden_buffers,
+                release_delay_ms=max(0, int(args.release_delay * 1000)))
+    # 主窗口绘制完成后在后台预热解码依赖；ultralytics在进入推理页时再预热
+    root.after(500, lambda: warm_up_imports(("numpy", "cv2")))
     root.mainloop()
+    # 关闭窗口时让后台推理在图片边界处停止，避免留下写了一半的文件
+    InferenceWorker.shutdown_all()
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    multiprocessing.freeze_support()  # 打包为exe后多进程推理需要
+    sys.exit(main())
 ###PATH:预标注桌面工具.py